@@ -0,0 +1,386 @@
+##############################################################################
+# benchmark.py
+##############################################################################
+# Measures the speed of the game's hot paths over a range of board sizes
+# and listener counts.  Run from this directory with
+#
+#    python benchmark.py [results file] [baseline file]
+#
+# The results are saved as JSON to the results file if one is given and
+# compared with the baseline, a results file saved earlier, if that is given
+# too.  Anything slower than the baseline by more than REGRESSION_THRESHOLD
+# is flagged and the exit status is 1.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+import json
+import os
+import platform
+import sys
+import timeit
+
+#boards are drawn onto surfaces in memory so no window is needed
+os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT","1")
+
+import pygame
+
+from lib.engine.systemevents import *
+from lib.engine.timing import monotonic
+from lib.gamestate import GameEventManager, GameState, SquareClicked, \
+                          create_grid, PALETTE, NUM_COLORS
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+#number of extra listeners attached on top of the engine's own, e.g. for
+#telemetry and AI
+EXTRA_LISTENER_COUNTS = [0,10,25,50]
+
+#events posted per measurement
+NUM_POSTS = 20000
+
+#number of measurements taken, the best is reported
+REPEATS = 5
+
+#width and height in squares of the boards measured
+BOARD_SIZES = [12,50,100,250,500,1000]
+
+#boards are made from this seed so every run measures the same boards
+BOARD_SEED = 1
+
+#clicks measured on each board
+NUM_CLICKS = 20
+
+#calls measured of the edge square and win checks
+NUM_CHECKS = 2000
+
+#largest size in pixels the boards are drawn at
+RENDER_SIZE = 480
+
+#how much slower than the baseline a result can be before it is flagged,
+#e.g. 0.2 is 20% slower
+REGRESSION_THRESHOLD = 0.2
+
+##############################################################################
+# EVENT DISPATCH
+##############################################################################
+
+class BenchListener(SystemEventListener):
+   """
+   Listener that checks the event type the way the engine's listeners do.
+   """
+
+   def __init__(self,system_event_manager,event_types):
+      self.event_types = event_types
+      SystemEventListener.__init__(self,system_event_manager)
+
+   def notify(self,event):
+      if isinstance(event,KeyboardEvent):
+         pass
+      if isinstance(event,MouseButtonEvent):
+         pass
+      if isinstance(event,QuitEvent):
+         pass
+
+#-----------------------------------------------------------------------------
+
+def make_listeners(system_event_manager,extra_listeners,typed):
+   """
+   Attaches listeners standing in for the CPU spinner, pygame events
+   manager, view and model, plus 'extra_listeners' that only care about
+   input.  If 'typed' is False every listener is sent every event, which is
+   how dispatch worked before listeners declared their event types.
+   """
+
+   engine_types = [(QuitEvent,), (TickEvent,), (ModelUpdated,), None]
+   extra_types = (KeyboardEvent, MouseButtonEvent)
+
+   listeners = []
+
+   for event_types in engine_types:
+      if not typed:
+         event_types = None
+      listeners.append(BenchListener(system_event_manager,event_types))
+
+   for i in range(extra_listeners):
+      if typed:
+         event_types = extra_types
+      else:
+         event_types = None
+      listeners.append(BenchListener(system_event_manager,event_types))
+
+   return listeners
+
+#-----------------------------------------------------------------------------
+
+def bench_dispatch(extra_listeners,typed):
+   """
+   Returns the seconds per post for a frame's worth of events, a TickEvent,
+   a RenderEvent and a ModelUpdated.
+   """
+
+   system_event_manager = SystemEventManager()
+   listeners = make_listeners(system_event_manager,extra_listeners,typed)
+
+   model_updated = ModelUpdated([])
+   post = system_event_manager.post
+
+   def run():
+      for i in range(NUM_POSTS//3):
+         post(TICK_EVENT)
+         post(RENDER_EVENT)
+         post(model_updated)
+
+   best = min(timeit.repeat(run,number=1,repeat=REPEATS))
+
+   return best/((NUM_POSTS//3)*3)
+
+##############################################################################
+# BOARDS
+##############################################################################
+
+def grid_kinds():
+   """
+   Returns the names of the kinds of grid that can be measured and whether
+   each is an ArrayGrid.  ArrayGrid is skipped if numpy isn't installed.
+   """
+
+   kinds = [("Grid", False)]
+
+   try:
+      import numpy
+   except ImportError:
+      return kinds
+
+   return kinds+[("ArrayGrid", True)]
+
+#-----------------------------------------------------------------------------
+
+def make_grid(size,array_grid):
+   """
+   Returns the board of 'size' by 'size' squares made from BOARD_SEED and
+   its square size.
+   """
+
+   import random
+
+   square_size = max(1,RENDER_SIZE//size)
+   grid = create_grid(GameEventManager(),square_size,
+                      random.Random(BOARD_SEED),array_grid,width=size,
+                      height=size,colors=PALETTE[:NUM_COLORS])
+
+   return grid, square_size
+
+#-----------------------------------------------------------------------------
+
+def plan_clicks(size):
+   """
+   Returns the squares clicked in each board benchmark, the first square
+   around the edge of the block for each click.  Both kinds of grid make
+   the same board so they are given the same clicks.
+   """
+
+   grid, square_size = make_grid(size,False)
+   clicks = []
+
+   while len(clicks) < NUM_CLICKS and not grid.is_filled():
+      square_idx = min(grid._get_edge_squares())
+      clicks.append(square_idx)
+      grid.notify(SquareClicked(square_idx))
+
+   return clicks
+
+#-----------------------------------------------------------------------------
+
+class _Game:
+   """
+   Stands in for a GameState so its methods can be measured without a
+   model and screen.
+   """
+
+   def __init__(self,grid):
+      self.grid = grid
+
+#-----------------------------------------------------------------------------
+
+def bench_board(size,array_grid,clicks):
+   """
+   Measures one kind of grid on the board of 'size' by 'size' squares.
+   Returns a dictionary of the best seconds taken by:
+
+      render       - drawing the whole board the first time
+      click        - each click, handled by the grid's notify
+      render_dirty - drawing the squares changed by the clicks
+      edge_squares - each call to the grid's _get_edge_squares
+      check_win    - each call to GameState._check_win
+   """
+
+   check_win = GameState._check_win
+   best = {}
+
+   def record(name,seconds):
+      best[name] = min(best.get(name,seconds),seconds)
+
+   for repeat in range(REPEATS):
+      grid, square_size = make_grid(size,array_grid)
+      surface = pygame.Surface((size*square_size,size*square_size))
+
+      start = monotonic()
+      grid.render(surface)
+      record("render",monotonic()-start)
+
+      start = monotonic()
+      for square_idx in clicks:
+         grid.notify(SquareClicked(square_idx))
+      record("click",(monotonic()-start)/max(1,len(clicks)))
+
+      start = monotonic()
+      grid.render_dirty(surface)
+      record("render_dirty",monotonic()-start)
+
+      start = monotonic()
+      for i in range(NUM_CHECKS):
+         grid._get_edge_squares()
+      record("edge_squares",(monotonic()-start)/NUM_CHECKS)
+
+      game = _Game(grid)
+
+      start = monotonic()
+      for i in range(NUM_CHECKS):
+         check_win(game)
+      record("check_win",(monotonic()-start)/NUM_CHECKS)
+
+   return best
+
+##############################################################################
+# SUITE
+##############################################################################
+
+def run_suite(board_sizes=BOARD_SIZES):
+   """
+   Runs every benchmark and returns a dictionary of benchmark name to the
+   best seconds taken per operation.
+   """
+
+   results = {}
+
+   pygame.display.init()
+
+   for size in board_sizes:
+      clicks = plan_clicks(size)
+
+      for kind, array_grid in grid_kinds():
+         for name, seconds in bench_board(size,array_grid,clicks).items():
+            results["%s/%s/%dx%d" % (name,kind,size,size)] = seconds
+
+   pygame.display.quit()
+
+   for extra_listeners in EXTRA_LISTENER_COUNTS:
+      listeners = extra_listeners+4
+
+      results["post/every event/%d listeners" % listeners] = \
+                                       bench_dispatch(extra_listeners,False)
+      results["post/by type/%d listeners" % listeners] = \
+                                        bench_dispatch(extra_listeners,True)
+
+   return results
+
+#-----------------------------------------------------------------------------
+
+def _sort_key(name):
+   """
+   Sorts benchmark names by the numbers in them rather than alphabetically,
+   so 12x12 comes before 1000x1000.
+   """
+
+   key = []
+
+   for part in name.split("/"):
+      number = part.split("x")[0].split()[0]
+
+      if number.isdigit():
+         key.append(int(number))
+      else:
+         key.append(part)
+
+   return key
+
+#-----------------------------------------------------------------------------
+
+def save_results(results,path):
+   """
+   Writes the results as JSON along with what they were measured on.
+   """
+
+   data = {
+      "python": platform.python_version(),
+      "pygame": pygame.version.ver,
+      "platform": platform.platform(),
+      "results": results,
+   }
+
+   results_file = open(path,"w")
+   json.dump(data,results_file,indent=1,sort_keys=True)
+   results_file.close()
+
+#-----------------------------------------------------------------------------
+
+def load_results(path):
+
+   results_file = open(path,"r")
+   data = json.load(results_file)
+   results_file.close()
+
+   return data["results"]
+
+#-----------------------------------------------------------------------------
+
+def compare(results,baseline,threshold=REGRESSION_THRESHOLD):
+   """
+   Returns a sorted list of (name, baseline seconds, seconds) for the
+   benchmarks more than 'threshold' slower than the baseline.
+   """
+
+   regressions = []
+
+   for name, seconds in results.items():
+      old_seconds = baseline.get(name)
+
+      if old_seconds and seconds > old_seconds*(1+threshold):
+         regressions.append((name,old_seconds,seconds))
+
+   return sorted(regressions,key=lambda regression: _sort_key(regression[0]))
+
+##############################################################################
+# MAIN EXECUTION
+##############################################################################
+
+if __name__ == "__main__":
+
+   results = run_suite()
+
+   print("%-36s %14s" % ("benchmark","us/op"))
+
+   for name in sorted(results,key=_sort_key):
+      print("%-36s %14.3f" % (name,results[name]*1000000))
+
+   if len(sys.argv) > 1:
+      save_results(results,sys.argv[1])
+
+   if len(sys.argv) > 2:
+      regressions = compare(results,load_results(sys.argv[2]))
+
+      print("")
+      print("%d regressions over %d%% against %s" %
+            (len(regressions),REGRESSION_THRESHOLD*100,sys.argv[2]))
+
+      for name, old_seconds, seconds in regressions:
+         print("%-36s %14.3f -> %.3f us/op (%+.0f%%)" %
+               (name,old_seconds*1000000,seconds*1000000,
+                (seconds/old_seconds-1)*100))
+
+      if regressions:
+         sys.exit(1)
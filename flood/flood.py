@@ -6,7 +6,9 @@
 # 12/12 - GoshDarnGames
 ##############################################################################
 
+import os
 import pygame
+from lib.engine.abs.events import EventManager
 from lib.engine.systemevents import SystemEventManager
 
 #controllers
@@ -29,9 +31,32 @@ from lib.gameoverstate import GameOverState
 
 GAME_NAME = "Flood"
 FPS = 60
+
+#game updates per second.  None runs one update before each frame, a number
+#runs updates on a fixed timestep independent of the frame rate.
+UPDATE_RATE = None
 SCREEN_SIZE = (480,480)
 BG_COLOR = (0,0,0)
 
+#queue system events and dispatch them in batches once per frame instead of
+#as soon as they are posted
+QUEUED_EVENTS = False
+
+#run the game from an asyncio event loop so it can share the process with
+#other asyncio tasks.  Requires python 3.7 or later.
+ASYNC_ENGINE = False
+
+#sleep until there is input when nothing on screen is changing rather than
+#running every frame.  Only used by the CPU spinner, not the asyncio driver.
+IDLE_WAIT = True
+
+#time every listener, state change and render pass, see
+#lib/engine/profiler.py.  The timings are written to PROFILE_FILE every
+#PROFILE_INTERVAL seconds.
+PROFILE = False
+PROFILE_FILE = os.path.join("data","profile.json")
+PROFILE_INTERVAL = 10.0
+
 
 ##############################################################################
 # GAME ENGINE CLASS
@@ -44,17 +69,25 @@ class GameEngine:
       #initialise pygame environment
       pygame.init()
       
+      if PROFILE:
+         from lib.engine.profiler import Profiler
+         EventManager.profiler = Profiler(PROFILE_FILE,PROFILE_INTERVAL)
+      
       #create system events manager
-      self.system_event_manager = SystemEventManager()
+      self.system_event_manager = SystemEventManager(QUEUED_EVENTS)
       
       #create controllers
-      self.cpu_spinner = CPUSpinner(self.system_event_manager,FPS)
       self.pygame_events_manager = \
                               PygameEventsManager(self.system_event_manager)
+      self.cpu_spinner = CPUSpinner(self.system_event_manager,FPS,
+                                    UPDATE_RATE,self.pygame_events_manager)
       
       #create model
       self.model = Model(self.system_event_manager,SCREEN_SIZE)
-      self.model.change_state(GameState(self.model,FPS))
+      self.model.start_state(GameState,FPS)
+      
+      if IDLE_WAIT:
+         self.cpu_spinner.wake_time = self.model.wake_time
       
       #create views
       self.pygame_view = PygameView(self.system_event_manager,GAME_NAME, \
@@ -68,12 +101,37 @@ class GameEngine:
       #start the cpu spinner
       self.cpu_spinner.run()
       
+   #--------------------------------------------------------------------------
+   
+   def start_async(self):
+      """
+      Returns a coroutine that runs the game on an asyncio event loop, e.g.
+      asyncio.run(game_engine.start_async()).
+      """
+      
+      from lib.engine.asyncdriver import AsyncDriver
+      
+      self.async_driver = AsyncDriver(self.system_event_manager,FPS,
+                                      UPDATE_RATE,self.pygame_events_manager)
+      
+      return self.async_driver.run()
+      
    
    
 ##############################################################################
 # MAIN EXECUTION
 ##############################################################################
 
-gameEngine = GameEngine()
-gameEngine.start()
-pygame.quit()
+#worker processes started without fork, e.g. for hints on windows and mac,
+#import this script again and mustn't start another game
+if __name__ == "__main__":
+
+   gameEngine = GameEngine()
+
+   if ASYNC_ENGINE:
+      import asyncio
+      asyncio.run(gameEngine.start_async())
+   else:
+      gameEngine.start()
+      
+   pygame.quit()
@@ -0,0 +1,382 @@
+##############################################################################
+# arraygrid.py
+##############################################################################
+# A version of the grid that stores colour indices in a numpy array so that
+# flooding and win checks run as whole-array operations.  Requires numpy.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import random
+import numpy
+import pygame
+
+from .engine.abs.gameobject import GameObject
+
+from .gamestate import GameEventListener, SquareClicked, UndoMove, RedoMove, \
+                       GRID_UPDATED, GRID_UNDONE
+from .boards import random_cells
+from .snapshot import BoardSnapshot
+
+##############################################################################
+# HELPER FUNCTIONS
+##############################################################################
+
+def dilate(mask):
+   """
+   Returns a copy of the boolean array 'mask' grown by one square
+   horizontally and vertically.
+   """
+
+   grown = mask.copy()
+
+   grown[1:,:] |= mask[:-1,:]
+   grown[:-1,:] |= mask[1:,:]
+   grown[:,1:] |= mask[:,:-1]
+   grown[:,:-1] |= mask[:,1:]
+
+   return grown
+
+#-----------------------------------------------------------------------------
+
+def label_regions(cells):
+   """
+   Returns an array shaped like 'cells' giving every square the label of
+   the block of same coloured squares it belongs to.  Labels are indices
+   of a square in the block.
+
+   Neighbouring squares of the same colour are joined by pointing the
+   larger label at the smaller and following labels until each points at
+   itself, which takes a few passes over the whole array rather than one
+   for each square along the longest block.
+   """
+
+   height, width = cells.shape
+
+   #labels are uint32, half the size of numpy's usual integers
+   idx = numpy.arange(cells.size,dtype=numpy.uint32).reshape(height,width)
+
+   #pairs of neighbouring squares of the same colour
+   across = cells[:,1:] == cells[:,:-1]
+   down = cells[1:,:] == cells[:-1,:]
+   first = numpy.concatenate((idx[:,:-1][across],idx[:-1,:][down]))
+   second = numpy.concatenate((idx[:,1:][across],idx[1:,:][down]))
+
+   labels = idx.reshape(-1)
+
+   while True:
+      first_labels = labels[first]
+      second_labels = labels[second]
+
+      #pairs already in the same block are done with
+      apart = first_labels != second_labels
+
+      if not apart.any():
+         break
+
+      first = first[apart]
+      second = second[apart]
+      first_labels = first_labels[apart]
+      second_labels = second_labels[apart]
+
+      labels[numpy.maximum(first_labels,second_labels)] = \
+                                numpy.minimum(first_labels,second_labels)
+
+      while True:
+         jumped = labels[labels]
+
+         if (jumped == labels).all():
+            break
+
+         labels = jumped
+
+   return labels.reshape(height,width)
+
+##############################################################################
+# GAME OBJECTS - ARRAY GRID
+##############################################################################
+
+class ArrayGrid(GameObject,GameEventListener):
+   """
+   Drop-in replacement for Grid.  Squares are stored as a 2d uint8 array of
+   indices into 'colors' rather than a list of RGB tuples.
+   """
+
+   event_types = (SquareClicked,UndoMove,RedoMove)
+
+   in_world = True
+
+   def __init__(self,game_event_manager,square_size,width,height,colors,
+                rng=random,cells=None):
+      """
+      rng   - random number generator used to colour the squares.  Pass a
+              seeded random.Random to get the same grid every time.
+      cells - colour indices of a board made earlier, e.g. from the board
+              cache, used instead of colouring the squares from 'rng'
+      """
+      GameEventListener.__init__(self,game_event_manager)
+
+      self.game_event_manager = game_event_manager
+
+      self.square_size = square_size
+      self.width = width
+      self.height = height
+      self.colors = colors
+
+      if cells is None:
+         cells = random_cells(rng,width*height,len(colors))
+
+      self.cells = numpy.frombuffer(bytes(cells),numpy.uint8).\
+                                                 reshape(height,width).copy()
+
+      #_labels labels the blocks of same coloured squares on the board as
+      #dealt.  Squares only change colour once they're in the top-left
+      #block, so the labels of the rest never need working out again.
+      self._labels = label_regions(self.cells)
+
+      #_owned flags the block of squares connected to the top-left and
+      #_edge flags the squares around it
+      self._owned = self._labels == self._labels[0,0]
+      self._edge = dilate(self._owned)
+      self._edge &= ~self._owned
+
+      #each move is kept as the square clicked, the colour the block was
+      #before it and the indices of the squares it absorbed.  _redo holds
+      #the squares clicked in the moves undone.
+      self._moves = []
+      self._redo = []
+
+      #the grid is drawn from an 8-bit surface with one pixel per square,
+      #using the colours as its palette, which is scaled up onto an
+      #off-screen surface that gets blitted to the screen.  _dirty flags
+      #squares that have changed colour since the last draw and
+      #_dirty_count counts the moves that set them so idle frames skip the
+      #scan.  The surfaces are created on the first draw.
+      self._index_surface = None
+      self._surface = None
+      self._dirty = numpy.zeros(self.cells.shape,numpy.bool_)
+      self._dirty_count = 0
+      self._drawn = False
+
+   #--------------------------------------------------------------------------
+
+   def render(self,screen):
+
+      self._update_surface(screen)
+      screen.blit(self._surface,(0,0))
+
+      self._drawn = True
+
+   #--------------------------------------------------------------------------
+
+   def repaint(self,screen,rect):
+      """
+      Draws the squares under 'rect' again, e.g. to rub out something drawn
+      over them.  Returns the rect drawn to.
+      """
+      return screen.blit(self._surface,rect,rect)
+
+   #--------------------------------------------------------------------------
+
+   def render_dirty(self,screen):
+      """
+      Draws only the squares that have changed colour since the grid was
+      last drawn.  Returns the rects that were drawn to.
+      """
+
+      if not self._drawn:
+         self.render(screen)
+         return [screen.get_rect().clip(self._surface.get_rect())]
+
+      rect = self._update_surface(screen)
+
+      if rect is None:
+         return []
+
+      return [screen.blit(self._surface,rect,rect)]
+
+   #--------------------------------------------------------------------------
+
+   def _update_surface(self,screen):
+      """
+      Copies the colour indices of the changed squares into the 8-bit
+      surface and scales the box around them onto the off-screen surface,
+      creating the surfaces if needed.  Returns the rect repainted on the
+      off-screen surface or None if nothing changed.
+      """
+
+      height, width = self.cells.shape
+      size = self.square_size
+
+      if self._surface is None:
+         self._index_surface = pygame.Surface((width,height),0,8)
+         self._index_surface.set_palette(self.colors)
+         self._surface = pygame.Surface((width*size,height*size),0,screen)
+
+         self._dirty[:] = True
+         self._dirty_count = 1
+
+      if not self._dirty_count:
+         return None
+
+      #box around the changed squares
+      rows = numpy.flatnonzero(self._dirty.any(axis=1))
+      cols = numpy.flatnonzero(self._dirty.any(axis=0))
+      top, bottom = int(rows[0]), int(rows[-1])+1
+      left, right = int(cols[0]), int(cols[-1])+1
+
+      #surfarray indexes pixels by x then y
+      pixels = pygame.surfarray.pixels2d(self._index_surface)
+      pixels[left:right,top:bottom] = self.cells[top:bottom,left:right].T
+      del pixels
+
+      area = pygame.Rect(left,top,right-left,bottom-top)
+      scaled = pygame.transform.scale(self._index_surface.subsurface(area),
+                                      (area.width*size,area.height*size))
+
+      self._dirty[:] = False
+      self._dirty_count = 0
+
+      return self._surface.blit(scaled,(left*size,top*size))
+
+   #--------------------------------------------------------------------------
+
+   def notify(self,event):
+      if isinstance(event,SquareClicked):
+
+         #a new move can't be followed by the moves undone before it
+         if self._click(event.square_idx):
+            del self._redo[:]
+
+      if isinstance(event,UndoMove):
+         self._undo()
+
+      if isinstance(event,RedoMove):
+         if self._redo:
+            self._click(self._redo.pop())
+
+   #--------------------------------------------------------------------------
+
+   def _click(self,square_idx):
+      """
+      Plays the move of clicking on 'square_idx'.  Returns True if the
+      square was around the edge of the block.
+      """
+
+      if not 0 <= square_idx < self.cells.size:
+         return False
+
+      y, x = divmod(square_idx,self.width)
+
+      #check if the clicked square is a neighbour of top-left block
+      if not self._edge[y,x]:
+         return False
+
+      color_idx = self.cells[y,x]
+      old_color_idx = self.cells[0,0]
+      owned = self._owned.copy()
+
+      self.cells[self._owned] = color_idx
+      self._dirty |= self._owned
+      self._dirty_count += 1
+      self._flood(color_idx)
+
+      owned ^= self._owned
+      absorbed = numpy.flatnonzero(owned).astype(numpy.uint32)
+      self._moves.append((square_idx,old_color_idx,absorbed))
+
+      self.game_event_manager.post(GRID_UPDATED)
+
+      return True
+
+   #--------------------------------------------------------------------------
+
+   def _undo(self):
+      """
+      Takes back the last move.
+      """
+
+      if not self._moves:
+         return
+
+      square_idx, color_idx, absorbed = self._moves.pop()
+      self._redo.append(square_idx)
+
+      #the squares absorbed go back to being the colour they were clicked
+      #as, which they still are
+      self._owned.reshape(-1)[absorbed] = False
+
+      self.cells[self._owned] = color_idx
+      self._dirty |= self._owned
+      self._dirty_count += 1
+
+      self._edge = dilate(self._owned)
+      self._edge &= ~self._owned
+
+      self.game_event_manager.post(GRID_UNDONE)
+
+   #--------------------------------------------------------------------------
+
+   def is_filled(self):
+      """
+      Returns True when every square is the same colour.
+      """
+      return bool(self._owned.all())
+
+   #--------------------------------------------------------------------------
+
+   def snapshot(self):
+      """
+      Returns a BoardSnapshot viewing the colour index of every square.
+      Nothing is copied, so it changes as the grid does.
+      """
+      return BoardSnapshot(memoryview(self.cells.reshape(-1)),self.width,
+                           self.height,len(self.colors))
+
+   #--------------------------------------------------------------------------
+
+   def memory_usage(self):
+      """
+      Returns roughly how many bytes the grid's arrays take up, not counting
+      the drawing surfaces.
+      """
+      return self.cells.nbytes+self._labels.nbytes+self._owned.nbytes+\
+             self._edge.nbytes+self._dirty.nbytes+\
+             sum(move[2].nbytes for move in self._moves)
+
+   #--------------------------------------------------------------------------
+
+   def _flood(self,color_idx):
+      """
+      Grows the block into every block of colour 'color_idx' around its
+      edge, then works out the new edge squares.
+      """
+
+      owned = self._owned
+
+      touching = self._labels[self._edge & (self.cells == color_idx)]
+
+      if touching.size:
+         absorbed = numpy.zeros(self.cells.size,numpy.bool_)
+         absorbed[touching] = True
+         owned |= absorbed[self._labels]
+
+      self._edge = dilate(owned)
+      self._edge &= ~owned
+
+   #--------------------------------------------------------------------------
+
+   def _get_attached(self):
+      """
+      Returns a list of squares attached to the top-left square.
+      """
+      return numpy.flatnonzero(self._owned).tolist()
+
+   #--------------------------------------------------------------------------
+
+   def _get_edge_squares(self):
+      """
+      Returns a list of squares that surround the block of squares connected
+      to the top-left corner.
+      """
+      return numpy.flatnonzero(self._edge).tolist()
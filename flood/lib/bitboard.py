@@ -0,0 +1,197 @@
+##############################################################################
+# bitboard.py
+##############################################################################
+# The squares of a grid stored as one big integer per colour with a bit for
+# each square, so the block can be grown and moves scored with shifts, ANDs
+# and bit counts over the whole board at once.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+##############################################################################
+# HELPER FUNCTIONS
+##############################################################################
+
+def _popcount(mask):
+   return bin(mask).count("1")
+
+#int.bit_count is much faster where it exists, from python 3.10
+if hasattr(int,"bit_count"):
+   _popcount = int.bit_count
+
+##############################################################################
+# BIT BOARD
+##############################################################################
+
+class BitBoard:
+   """
+   Square (x, y) is bit y*stride+x, where 'stride' is one more than the
+   width.  The extra bit at the end of each row is never set, so shifting a
+   mask left or right by one can't carry a square from the end of one row
+   onto the start of the next.
+
+   'owned' is the mask of the block joined to the top-left.  Squares outside
+   it never change colour so the colour masks are only ever changed inside
+   it.
+   """
+
+   def __init__(self,cells,width,height,num_colors):
+      """
+      cells      - colour indices, one per square, row by row, in
+                   anything supporting the buffer protocol
+      width      - number of squares in each row
+      height     - number of rows
+      num_colors - number of colours in the palette
+      """
+
+      self.width = width
+      self.height = height
+      self.num_colors = num_colors
+      self.stride = width+1
+
+      cells = bytes(cells)
+      rows = [cells[y*width:(y+1)*width] for y in range(height)]
+
+      #every colour mask is made by turning the cells into a string of
+      #binary digits and parsing it in one go.  The string is reversed as
+      #the first square is the lowest bit.
+      self.color_masks = []
+
+      for color in range(num_colors):
+         table = bytearray(b"0"*256)
+         table[color] = ord("1")
+
+         digits = b"0".join([row.translate(bytes(table)) for row in rows])
+         self.color_masks.append(int(digits[::-1] or b"0",2))
+
+      self.full = 0
+      for mask in self.color_masks:
+         self.full |= mask
+
+      self.color = bytearray(cells[:1] or b"\0")[0]
+      self.owned = self.flood(1,self.color_masks[self.color])
+
+   #--------------------------------------------------------------------------
+
+   def dilate(self,mask):
+      """
+      Returns 'mask' grown by one square in each direction.
+      """
+
+      stride = self.stride
+
+      return (mask | mask << 1 | mask >> 1 | mask << stride |
+              mask >> stride) & self.full
+
+   #--------------------------------------------------------------------------
+
+   def flood(self,mask,allowed):
+      """
+      Returns 'mask' grown into every square of 'allowed' connected to it.
+      """
+
+      while True:
+         grown = self.dilate(mask) & allowed | mask
+
+         if grown == mask:
+            return mask
+
+         mask = grown
+
+   #--------------------------------------------------------------------------
+
+   def frontier(self):
+      """
+      Returns the mask of the squares around the edge of the block.
+      """
+      return self.dilate(self.owned) & ~self.owned
+
+   #--------------------------------------------------------------------------
+
+   def absorbed(self,color):
+      """
+      Returns the mask of the squares changing the block to 'color' would
+      join to it.
+      """
+
+      owned = self.owned
+
+      if not self.dilate(owned) & ~owned & self.color_masks[color]:
+         return 0
+
+      return self.flood(owned,owned | self.color_masks[color]) & ~owned
+
+   #--------------------------------------------------------------------------
+
+   def score_moves(self):
+      """
+      Returns a list of how many squares each colour would join to the
+      block.  Colours that aren't around the block score 0.
+      """
+      return [_popcount(self.absorbed(color))
+              for color in range(self.num_colors)]
+
+   #--------------------------------------------------------------------------
+
+   def play(self,color):
+      """
+      Changes the block to 'color' and grows it.  Returns the number of
+      squares joined.
+      """
+
+      owned = self.owned
+      absorbed = self.absorbed(color)
+
+      for i in range(self.num_colors):
+         self.color_masks[i] &= ~owned
+
+      self.owned = owned | absorbed
+      self.color_masks[color] |= self.owned
+      self.color = color
+
+      return _popcount(absorbed)
+
+   #--------------------------------------------------------------------------
+
+   def is_filled(self):
+      return self.owned == self.full
+
+   #--------------------------------------------------------------------------
+
+   def count(self,mask):
+      """
+      Returns the number of squares in 'mask'.
+      """
+      return _popcount(mask)
+
+   #--------------------------------------------------------------------------
+
+   def squares(self,mask):
+      """
+      Returns the indices of the squares in 'mask' in the same row by row
+      order as the cells.
+      """
+
+      squares = []
+      stride = self.stride
+      width = self.width
+
+      while mask:
+         low = mask & -mask
+         y, x = divmod(low.bit_length()-1,stride)
+         squares.append(y*width+x)
+         mask ^= low
+
+      return squares
+
+#-----------------------------------------------------------------------------
+
+def bitboard_from_grid(grid):
+   """
+   Creates a BitBoard from the current squares of a Grid or ArrayGrid.
+   """
+
+   snapshot = grid.snapshot()
+
+   return BitBoard(snapshot.cells,snapshot.width,snapshot.height,
+                   snapshot.num_colors)
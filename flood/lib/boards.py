@@ -0,0 +1,365 @@
+##############################################################################
+# boards.py
+##############################################################################
+# Generates boards from seeds and keeps a cache of pre-generated boards on
+# disk sorted by how hard they are, so new games can start straight away
+# from a board of a chosen difficulty.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import array
+import binascii
+import mmap
+import os
+import random
+import struct
+
+from .workers import pool_imap
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+BOARD_CACHE_DIR = os.path.join("data","boards")
+
+#each cached board is its seed and par score followed by its colour indices
+#packed two to a byte
+RECORD_HEADER = struct.Struct("<QH")
+
+##############################################################################
+# GENERATION
+##############################################################################
+
+def _random_bytes(rng,count):
+   """
+   Returns 'count' random bytes drawn from 'rng' in one call.
+   """
+   return binascii.unhexlify("%0*x" % (count*2,rng.getrandbits(count*8)))
+
+#-----------------------------------------------------------------------------
+
+def random_cells(rng,size,num_colors):
+   """
+   Returns a bytearray of 'size' colour indices below 'num_colors' drawn
+   from 'rng'.  The bytes are drawn in bulk and mapped onto colours with a
+   translation table.  Bytes that would make some colours more likely than
+   others are thrown away and more drawn.  A board of a single colour is
+   never returned.
+   """
+
+   #the largest multiple of num_colors that fits in a byte
+   limit = 256-256 % num_colors
+
+   table = bytearray(i % num_colors for i in range(256))
+   table = bytes(table)
+   rejected = bytes(bytearray(range(limit,256)))
+
+   while True:
+      cells = bytearray()
+
+      while len(cells) < size:
+         wanted = size-len(cells)
+         cells += _random_bytes(rng,wanted+wanted//8+1).translate(table,
+                                                                   rejected)
+
+      del cells[size:]
+
+      if size < 2 or cells.count(cells[0]) != size:
+         return cells
+
+#-----------------------------------------------------------------------------
+
+def generate_board(seed,width,height,num_colors):
+   """
+   Returns the colour indices of the board made from 'seed'.  The same seed
+   always gives the same board.
+   """
+   return random_cells(random.Random(seed),width*height,num_colors)
+
+##############################################################################
+# NEIGHBOUR TABLES
+##############################################################################
+
+#(width, height) -> neighbour table, shared by every board of that shape
+_neighbour_tables = {}
+
+def neighbour_table(width,height):
+   """
+   Returns an array holding the east, west, north and south neighbours of
+   every square of a board, four entries per square with -1 where a square
+   is on the edge.  The neighbours of square 'idx' are
+   table[idx*4:idx*4+4].  Built once for each shape of board.
+   """
+
+   key = (width,height)
+
+   if key in _neighbour_tables:
+      return _neighbour_tables[key]
+
+   size = width*height
+   squares = range(size)
+
+   table = array.array("i",[-1])*(size*4)
+   table[0::4] = array.array("i",[idx+1 if (idx+1) % width else -1
+                                  for idx in squares])
+   table[1::4] = array.array("i",[idx-1 if idx % width else -1
+                                  for idx in squares])
+   table[2::4] = array.array("i",[idx-width if idx >= width else -1
+                                  for idx in squares])
+   table[3::4] = array.array("i",[idx+width if idx+width < size else -1
+                                  for idx in squares])
+
+   _neighbour_tables[key] = table
+
+   return table
+
+##############################################################################
+# PACKING
+##############################################################################
+
+def pack_cells(cells):
+   """
+   Packs a bytearray of colour indices below 16 two to a byte.
+   """
+
+   if len(cells) % 2:
+      cells = cells+bytearray(1)
+
+   high = bytes(cells[0::2]).translate(_SHIFT_TABLE)
+   low = bytes(cells[1::2])
+
+   #the high and low nibbles never overlap so or-ing them as big integers
+   #combines every byte at once
+   packed = int(binascii.hexlify(high),16) | int(binascii.hexlify(low),16)
+
+   return bytearray(binascii.unhexlify("%0*x" % (len(high)*2,packed)))
+
+#-----------------------------------------------------------------------------
+
+def unpack_cells(packed,size):
+   """
+   Reverses pack_cells, returning 'size' colour indices.
+   """
+
+   packed = bytes(packed)
+
+   cells = bytearray(len(packed)*2)
+   cells[0::2] = packed.translate(_HIGH_TABLE)
+   cells[1::2] = packed.translate(_LOW_TABLE)
+
+   del cells[size:]
+
+   return cells
+
+_SHIFT_TABLE = bytes(bytearray((i << 4) & 0xff for i in range(256)))
+_HIGH_TABLE = bytes(bytearray(i >> 4 for i in range(256)))
+_LOW_TABLE = bytes(bytearray(i & 0xf for i in range(256)))
+
+##############################################################################
+# BOARD CACHE
+##############################################################################
+
+class CachedBoard:
+
+   def __init__(self,seed,par,cells):
+      self.seed = seed
+      self.par = par
+      self.cells = cells
+
+#-----------------------------------------------------------------------------
+
+def _score_board(args):
+   """
+   Generates a board and works out its par score.  'args' is a (seed,
+   width, height, num_colors) tuple and the result is a (seed, par, cells)
+   tuple.
+   """
+
+   from .solver import Board, par_score
+
+   seed, width, height, num_colors = args
+
+   cells = generate_board(seed,width,height,num_colors)
+
+   return (seed, par_score(Board(list(cells),width,num_colors)), cells)
+
+#-----------------------------------------------------------------------------
+
+class BoardCache:
+   """
+   A file of boards of one size and number of colours, each stored with the
+   seed it was made from and its par score, which is used as its
+   difficulty.  Every record is the same size so a board is read straight
+   from its position in the file.
+   """
+
+   def __init__(self,width,height,num_colors,directory=BOARD_CACHE_DIR):
+
+      self.width = width
+      self.height = height
+      self.num_colors = num_colors
+      self.size = width*height
+
+      self.path = os.path.join(directory,"%dx%d-%d.bin" %
+                                         (width,height,num_colors))
+
+      self.record_size = RECORD_HEADER.size+(self.size+1)//2
+
+      #par score -> list of record numbers
+      self.by_par = {}
+
+      self._load_index()
+
+   #--------------------------------------------------------------------------
+
+   def _load_index(self):
+      """
+      Reads the seed and par score of every board in the file.
+      """
+
+      self.by_par = {}
+
+      if not os.path.exists(self.path):
+         return
+
+      cache_file = open(self.path,"rb")
+
+      try:
+         count = os.fstat(cache_file.fileno()).st_size//self.record_size
+
+         if count == 0:
+            return
+
+         data = mmap.mmap(cache_file.fileno(),0,access=mmap.ACCESS_READ)
+
+         for i in range(count):
+            seed, par = RECORD_HEADER.unpack_from(data,i*self.record_size)
+            self.by_par.setdefault(par,[]).append(i)
+
+         data.close()
+
+      finally:
+         cache_file.close()
+
+   #--------------------------------------------------------------------------
+
+   def __len__(self):
+      return sum(len(records) for records in self.by_par.values())
+
+   #--------------------------------------------------------------------------
+
+   def difficulties(self):
+      """
+      Returns a sorted list of (par score, number of boards).
+      """
+      return sorted((par, len(records))
+                    for par, records in self.by_par.items())
+
+   #--------------------------------------------------------------------------
+
+   def generate(self,count,seed=None,processes=None):
+      """
+      Generates and scores 'count' boards spread over a pool of worker
+      processes and appends them to the file.  The boards' seeds are drawn
+      from 'seed', so the same seed always adds the same boards.
+      """
+
+      seed_rng = random.Random(seed)
+      tasks = [(seed_rng.getrandbits(32), self.width, self.height,
+                self.num_colors) for i in range(count)]
+
+      directory = os.path.dirname(self.path)
+      if directory and not os.path.isdir(directory):
+         os.makedirs(directory)
+
+      cache_file = open(self.path,"ab")
+
+      try:
+         for board_seed, par, cells in pool_imap(_score_board,tasks,
+                                                 processes,4):
+            cache_file.write(RECORD_HEADER.pack(board_seed,par)+
+                             pack_cells(cells))
+
+      finally:
+         cache_file.close()
+
+      self._load_index()
+
+   #--------------------------------------------------------------------------
+
+   def read(self,record):
+      """
+      Returns the CachedBoard stored as record number 'record'.
+      """
+
+      cache_file = open(self.path,"rb")
+      cache_file.seek(record*self.record_size)
+      data = cache_file.read(self.record_size)
+      cache_file.close()
+
+      seed, par = RECORD_HEADER.unpack_from(data)
+
+      return CachedBoard(seed,par,
+                         unpack_cells(data[RECORD_HEADER.size:],self.size))
+
+   #--------------------------------------------------------------------------
+
+   def pick(self,min_par=None,max_par=None,rng=random):
+      """
+      Returns a random CachedBoard with a par score between 'min_par' and
+      'max_par', or None if the cache has none.
+      """
+
+      records = []
+
+      for par, par_records in self.by_par.items():
+         if min_par is not None and par < min_par:
+            continue
+         if max_par is not None and par > max_par:
+            continue
+         records.extend(par_records)
+
+      if not records:
+         return None
+
+      return self.read(rng.choice(records))
+
+##############################################################################
+# SHARED CACHES
+##############################################################################
+
+#(width, height, number of colours) -> BoardCache, so the index is read
+#once
+_caches = {}
+
+def get_board_cache(width,height,num_colors):
+   """
+   Returns the BoardCache for boards of the given size, reading its index
+   the first time.
+   """
+
+   key = (width,height,num_colors)
+
+   if key not in _caches:
+      _caches[key] = BoardCache(width,height,num_colors)
+
+   return _caches[key]
+
+##############################################################################
+# MAIN EXECUTION
+##############################################################################
+# Fills the cache, e.g. 'python -m lib.boards 12 12 6 1000' from the flood
+# directory adds 1000 12x12 boards of 6 colours.
+
+if __name__ == "__main__":
+
+   import sys
+
+   width, height, num_colors, count = [int(arg) for arg in sys.argv[1:5]]
+
+   board_cache = get_board_cache(width,height,num_colors)
+   board_cache.generate(count)
+
+   for par, boards in board_cache.difficulties():
+      print("par %3d: %d boards" % (par,boards))
@@ -6,17 +6,30 @@
 # 06/12 - GoshDarnGames
 ##############################################################################
 
-from weakref import WeakKeyDictionary
+from weakref import WeakKeyDictionary, ref
+from collections import deque
+
+from ..timing import monotonic
+
+#most times a queued event manager goes round its queue in one drain.  Stops
+#listeners that keep posting in response to each other from hanging a frame.
+MAX_DRAIN_PASSES = 16
 
 ##############################################################################
 # EVENT SUPERCLASS
 ##############################################################################
 
-class Event:
+class Event(object):
    """
-   Superclass for all events.
+   Superclass for all events.  Events are created many times a second so
+   subclasses should list their attributes in __slots__ to keep them small.
    """
-   pass
+   
+   __slots__ = ()
+   
+   #if True, only the last event of this class in a batch of queued events
+   #is dispatched
+   coalesce = False
    
 ##############################################################################
 # LISTENER SUPERCLASS
@@ -27,12 +40,25 @@ class Listener:
    Interface for listeners.                                                   
    """
    
+   #tuple of the classes of event the listener is notified of, including 
+   #subclasses.  None means every event.
+   event_types = None
+   
    def __init__(self,event_manager):
       event_manager.register_listener(self)
    
    def notify(self,event):
       raise NotImplementedError
       
+   #notify may return an awaitable, e.g. when it is an 'async def', which is
+   #passed to the event manager's async_handler to be run.  See 
+   #engine/asyncdriver.py.
+   #
+   #Listeners may also define notify_batch(events).  Queued event managers
+   #then call it once per batch with the list of events the listener is
+   #interested in, after the batch has been sent to the other listeners,
+   #instead of calling notify for each event.
+      
 ##############################################################################
 # EVENT MANAGER SUPERCLASS
 ##############################################################################
@@ -41,26 +67,257 @@ class EventManager:
    """
    Superclass for all event managers.  Keeps a list of listeners and 
    dispatches events to them.
+   
+   By default events are dispatched as soon as they are posted.  In queued
+   mode they are stored until drain() is called, so listeners posting 
+   events never run inside another listener's notify.
    """
    
-   def __init__(self):
+   #set to an engine/profiler.py Profiler to time every listener called by
+   #every event manager.  Times include any events a listener posts that
+   #are dispatched straight away.
+   profiler = None
+   
+   def __init__(self,queued=False):
       self.listeners = WeakKeyDictionary()
       
+      self.queued = queued
+      self._queue = deque()
+      self._draining = False
+      
+      #called with anything a listener's notify returns, so listeners can
+      #be coroutines.  Set by the asyncio driver.
+      self.async_handler = None
+      
+      #maps each class of event posted to a tuple of weak references to the
+      #listeners interested in it.  Entries are built the first time a 
+      #class is posted and the table is replaced whenever the listeners 
+      #change.
+      self._dispatch = {}
+      
+      #goes up by one whenever the listeners or the events they want change
+      self.version = 0
+      
    #--------------------------------------------------------------------------
    
    def register_listener(self,listener):
       self.listeners[listener] = 1
+      self.event_types_changed()
       
    #--------------------------------------------------------------------------
    
    def unregister_listener(self,listener):
-      if listener in self.listeners.keys():
+      if listener in self.listeners:
          del self.listeners[listener]
+         self.event_types_changed()
+         
+   #--------------------------------------------------------------------------
+   
+   def event_types_changed(self):
+      """
+      Must be called when a registered listener changes its event_types.
+      """
+      self._dispatch = {}
+      self.version += 1
+      
+   #--------------------------------------------------------------------------
+   
+   def has_listeners(self,event_class):
+      """
+      Returns True if any listener wants events of 'event_class'.
+      """
+      
+      try:
+         listeners = self._dispatch[event_class]
+      except KeyError:
+         listeners = self._build_dispatch(event_class)
+         
+      return bool(listeners)
          
    #--------------------------------------------------------------------------
    
    def post(self,event):
+   
+      if self.queued:
+         self._queue.append(event)
+         return
+   
+      try:
+         listeners = self._dispatch[event.__class__]
+      except KeyError:
+         listeners = self._build_dispatch(event.__class__)
+         
+      if self.profiler is not None:
+         self._post_profiled(event,listeners)
+         return
+         
+      for listener_ref in listeners:
+         listener = listener_ref()
+         
+         if listener is not None:
+            result = listener.notify(event)
+            
+            if result is not None:
+               self._handle_result(result)
+            
+   #--------------------------------------------------------------------------
+   
+   def _post_profiled(self,event,listeners):
+      """
+      Sends an event to listeners like post, timing each one.
+      """
+      
+      profiler = self.profiler
+      
+      for listener_ref in listeners:
+         listener = listener_ref()
+         
+         if listener is not None:
+            start = monotonic()
+            result = listener.notify(event)
+            profiler.record_call(listener,event,monotonic()-start)
+            
+            if result is not None:
+               self._handle_result(result)
+            
+   #--------------------------------------------------------------------------
+   
+   def drain(self):
+      """
+      Dispatches queued events in batches until the queue is empty.  Events
+      posted while a batch is being dispatched go into the next batch.
+      Does nothing if called while already draining.
+      """
+      
+      if self._draining:
+         return
+         
+      self._draining = True
+      
+      try:
+         passes = 0
+         
+         while self._queue and passes < MAX_DRAIN_PASSES:
+            batch = list(self._queue)
+            self._queue.clear()
+            
+            self._dispatch_batch(self._coalesce(batch))
+            passes += 1
+            
+      finally:
+         self._draining = False
+         
+   #--------------------------------------------------------------------------
+   
+   def _coalesce(self,events):
+      """
+      Removes all but the last of each class of event that coalesces.
+      """
+      
+      last = {}
+      
+      for i, event in enumerate(events):
+         if getattr(event,'coalesce',False):
+            last[event.__class__] = i
+            
+      if not last:
+         return events
+         
+      return [event for i, event in enumerate(events)
+              if last.get(event.__class__,i) == i]
+              
+   #--------------------------------------------------------------------------
+   
+   def _dispatch_batch(self,events):
+      """
+      Sends a batch of events to listeners, one by one to those with only
+      notify and all at once to those with notify_batch.
+      """
+      
+      batches = {}
+      listener_order = []
+      
+      profiler = self.profiler
+      
+      for event in events:
+      
+         try:
+            listeners = self._dispatch[event.__class__]
+         except KeyError:
+            listeners = self._build_dispatch(event.__class__)
+            
+         for listener_ref in listeners:
+            listener = listener_ref()
+            
+            if listener is None:
+               continue
+               
+            if getattr(listener,'notify_batch',None) is None:
+            
+               if profiler is None:
+                  result = listener.notify(event)
+               else:
+                  start = monotonic()
+                  result = listener.notify(event)
+                  profiler.record_call(listener,event,monotonic()-start)
+            
+               if result is not None:
+                  self._handle_result(result)
+            elif listener in batches:
+               batches[listener].append(event)
+            else:
+               batches[listener] = [event]
+               listener_order.append(listener)
+               
+      for listener in listener_order:
+      
+         if profiler is None:
+            result = listener.notify_batch(batches[listener])
+         else:
+            start = monotonic()
+            result = listener.notify_batch(batches[listener])
+            profiler.record_call(listener,batches[listener],
+                                 monotonic()-start)
+         
+         if result is not None:
+            self._handle_result(result)
+            
+   #--------------------------------------------------------------------------
+   
+   def _handle_result(self,result):
+      """
+      Hands whatever a listener returned to async_handler.
+      """
+      
+      if self.async_handler is not None:
+         self.async_handler(result)
+      
+   #--------------------------------------------------------------------------
+   
+   def _build_dispatch(self,event_class):
+      """
+      Works out which listeners want events of 'event_class' and adds them
+      to the dispatch table.
+      """
+      
+      listeners = []
+      
       for listener in self.listeners.keys():
-         listener.notify(event)
+         event_types = listener.event_types
+         
+         if event_types is None or issubclass(event_class,event_types):
+            listeners.append(ref(listener,self._listener_deleted))
+            
+      listeners = tuple(listeners)
+      self._dispatch[event_class] = listeners
+      
+      return listeners
+      
+   #--------------------------------------------------------------------------
    
+   def _listener_deleted(self,listener_ref):
+      """
+      Called when a listener is garbage collected.
+      """
+      self.event_types_changed()
    
\ No newline at end of file
@@ -9,5 +9,17 @@
 
 class GameObject:
    
+   #True for objects drawn onto the world surface and shown through the
+   #state's viewport rather than drawn straight onto the screen
+   in_world = False
+   
    def render(self, surface):
-      raise NotImplementedError
\ No newline at end of file
+      raise NotImplementedError
+      
+   def render_dirty(self, surface):
+      """
+      Draws only what has changed since the object was last drawn and
+      returns a list of the rects drawn to.  Returning None tells the view
+      that the object can't tell, so the whole screen is redrawn.
+      """
+      return None
\ No newline at end of file
@@ -8,6 +8,12 @@
 
 class State:
    
+   #tuple of the classes of system event the model passes on to the state,
+   #besides the tick and render events every state gets.  None means every
+   #system event.  Input no state wants is left in pygame, see 
+   #engine/pygameeventsmanager.py.
+   system_event_types = None
+   
    def __init__(self,model):
       """
       Creates a state with a reference to the model and an empty list
@@ -15,8 +21,22 @@ class State:
       """
       self.model = model
       self.game_objects = []
+      
+      #Viewport through which game objects drawn in the world are shown, 
+      #or None if the state has no world
+      self.viewport = None
    
       
+   def wake_time(self):
+      """
+      Returns the monotonic time the state next needs an update for 
+      something other than input, e.g. an animation or timer, or None if 
+      nothing will change until there is input.  A time that has already
+      passed means the state needs updating every frame, which is what is
+      assumed unless a state says otherwise.
+      """
+      return 0.0
+      
    def get_game_objects(self):
       """
       Returns a list of all game objects tracked by the state.  Note that it
@@ -0,0 +1,170 @@
+##############################################################################
+# asyncdriver.py
+##############################################################################
+# Drives the game from an asyncio event loop instead of the blocking loop in
+# CPUSpinner, so the game can share a process with other asyncio tasks.
+# Requires python 3.7 or later.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+import asyncio
+
+from .systemevents import *
+from .timing import monotonic, FrameStats
+from .cpuspinner import MAX_UPDATES_PER_FRAME
+
+##############################################################################
+# ASYNC DRIVER
+##############################################################################
+
+class AsyncDriver(SystemEventListener):
+   """
+   Generates tick and render events from asyncio timers, the same way as
+   CPUSpinner.  Listeners on the system event manager can be coroutines;
+   whatever they return from notify is run as a task on the loop.
+   """
+
+   event_types = (QuitEvent,)
+
+   def __init__(self,system_event_manager,fps,update_rate=None,
+                pygame_events_manager=None):
+      """
+      fps                   - frames rendered per second.  0 renders as
+                              fast as possible, yielding to other tasks
+                              between frames.
+      update_rate           - game updates per second, or None for one
+                              update before each frame.
+      pygame_events_manager - if given, pygame is polled for events by a
+                              separate task instead of on each tick.
+      """
+
+      SystemEventListener.__init__(self,system_event_manager)
+
+      self.system_event_manager = system_event_manager
+      self.fps = fps
+      self.update_rate = update_rate
+      self.pygame_events_manager = pygame_events_manager
+
+      self.running = True
+
+      #time spent updating, rendering and idling in recent frames
+      self.frame_stats = FrameStats()
+
+      #tasks started for coroutine listeners that haven't finished
+      self.tasks = set()
+
+   #--------------------------------------------------------------------------
+
+   async def run(self):
+      """
+      Runs the game until a QuitEvent is posted.
+      """
+
+      self.system_event_manager.async_handler = self._start_task
+
+      if self.pygame_events_manager is not None:
+         self.pygame_events_manager.poll_on_tick = False
+         self._start_task(self._poll_events())
+
+      if self.fps:
+         frame_time = 1.0/self.fps
+      else:
+         frame_time = 0.0
+
+      if self.update_rate is None:
+         step = None
+      else:
+         step = 1.0/self.update_rate
+
+      lag = 0.0
+      last_time = next_frame = monotonic()
+
+      try:
+         while self.running:
+
+            idle_start = monotonic()
+            await asyncio.sleep(max(next_frame-idle_start,0.0))
+            update_start = monotonic()
+
+            next_frame = max(next_frame+frame_time,update_start)
+
+            if step is None:
+               self._update()
+            else:
+               lag += update_start-last_time
+               updates = 0
+
+               while lag >= step and self.running:
+                  self._update()
+                  lag -= step
+                  updates += 1
+
+                  if updates == MAX_UPDATES_PER_FRAME:
+                     lag = 0.0
+
+            last_time = update_start
+
+            render_start = monotonic()
+            self.system_event_manager.post(RENDER_EVENT)
+            self.system_event_manager.drain()
+            render_end = monotonic()
+
+            profiler = self.system_event_manager.profiler
+
+            if profiler is not None:
+               profiler.end_frame(render_end-render_start)
+
+            self.frame_stats.record(render_start-update_start,
+                                    render_end-render_start,
+                                    update_start-idle_start)
+
+      finally:
+         self.system_event_manager.async_handler = None
+
+         for task in list(self.tasks):
+            task.cancel()
+
+   #--------------------------------------------------------------------------
+
+   def _update(self):
+      """
+      Posts the tick event for one game update.
+      """
+      self.system_event_manager.post(TICK_EVENT)
+      self.system_event_manager.drain()
+
+   #--------------------------------------------------------------------------
+
+   async def _poll_events(self):
+      """
+      Polls pygame for events at the update rate, or the frame rate if
+      updates are tied to frames.
+      """
+
+      rate = self.update_rate or self.fps or 60
+
+      while self.running:
+         self.pygame_events_manager.poll()
+         self.system_event_manager.drain()
+
+         await asyncio.sleep(1.0/rate)
+
+   #--------------------------------------------------------------------------
+
+   def _start_task(self,awaitable):
+      """
+      Runs 'awaitable' as a task on the loop and keeps hold of it until it
+      finishes.
+      """
+
+      task = asyncio.ensure_future(awaitable)
+
+      self.tasks.add(task)
+      task.add_done_callback(self.tasks.discard)
+
+   #--------------------------------------------------------------------------
+
+   def notify(self,event):
+      if isinstance(event,QuitEvent):
+         self.running = False
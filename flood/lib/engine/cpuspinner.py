@@ -1,26 +1,51 @@
 ##############################################################################
 # cpuspinner.py
 ##############################################################################
-# Class used to keep the game looping.  Generates a tick event each time
-# the game loops.
+# Class used to keep the game looping.  Generates a tick event for each game
+# update and a render event for each frame.
 ##############################################################################
 # 06/12 - GoshDarnGames
 ##############################################################################
 
-from systemevents import *
+from .systemevents import *
+from .timing import monotonic, FrameStats
 import pygame
+
+#most updates run in one frame when catching up with the fixed timestep.
+#Time beyond this is dropped so a long stall doesn't freeze the game while
+#it catches up.
+MAX_UPDATES_PER_FRAME = 10
+
+#longest time in seconds the loop sleeps waiting for input before running a
+#frame anyway
+MAX_IDLE_WAIT = 1.0
    
 class CPUSpinner(SystemEventListener):
 
-   def __init__(self,system_event_manager,fps):
+   event_types = (QuitEvent,)
+
+   def __init__(self,system_event_manager,fps,update_rate=None,
+                pygame_events_manager=None):
+      """
+      fps         - frames rendered per second.  0 renders as fast as 
+                    possible.
+      update_rate - game updates per second.  If None there is one update
+                    before each frame, otherwise updates run on a fixed 
+                    timestep independent of the frame rate.
+      pygame_events_manager - handed the pygame event that wakes the loop
+                    when waiting for input, see wake_time.  Waiting is
+                    turned off without it.
+      """
    
       SystemEventListener.__init__(self,system_event_manager)
    
       #reference to the events manager
       self.system_event_manager = system_event_manager
+      self.pygame_events_manager = pygame_events_manager
       
       #desired FPS
       self.fps = fps
+      self.update_rate = update_rate
       
       #boolean to indicate whether we should keep running
       self.running = True
@@ -28,19 +53,136 @@ class CPUSpinner(SystemEventListener):
       #clock used to maintain FPS
       self.clock = pygame.time.Clock()
       
+      #time spent updating, rendering and idling in recent frames
+      self.frame_stats = FrameStats()
+      
+      #function returning the monotonic time the game next needs an update
+      #without input, or None if nothing changes until there is input, e.g.
+      #Model.wake_time.  If set, the loop sleeps until there is input or
+      #the game needs an update rather than running every frame.
+      self.wake_time = None
+      
    #--------------------------------------------------------------------------
       
    def run(self):
+   
+      if self.update_rate is None:
+         step = None
+      else:
+         step = 1.0/self.update_rate
+         
+      #time owed to the fixed timestep updates
+      lag = 0.0
+      last_time = monotonic()
+      
+      #the first frame is always drawn before waiting for input
+      drawn = False
+   
       while(self.running):
-         self.clock.tick(self.fps)
-         event = TickEvent()
-         self.system_event_manager.post(event)
+      
+         idle_start = monotonic()
+         
+         waited = drawn and self._wait_for_input()
          
+         if not waited:
+            self.clock.tick(self.fps)
+            
+         update_start = monotonic()
+         
+         if step is None:
+            self._update()
+         elif waited:
+            #nothing is owed for the time spent waiting, but the input that
+            #woke the game is handled straight away
+            self._update()
+            lag = 0.0
+         else:
+            lag += update_start-last_time
+            updates = 0
+            
+            while lag >= step and self.running:
+               self._update()
+               lag -= step
+               updates += 1
+               
+               if updates == MAX_UPDATES_PER_FRAME:
+                  lag = 0.0
+                  
+         last_time = update_start
+               
+         render_start = monotonic()
+         self.system_event_manager.post(RENDER_EVENT)
+         self.system_event_manager.drain()
+         render_end = monotonic()
+         
+         profiler = self.system_event_manager.profiler
+         
+         if profiler is not None:
+            profiler.end_frame(render_end-render_start)
+         
+         self.frame_stats.record(render_start-update_start,
+                                 render_end-render_start,
+                                 update_start-idle_start)
+                                 
+         drawn = True
+                                 
    #--------------------------------------------------------------------------
    
-   def notify(self,event):
-      if isinstance(event,QuitEvent):
-         self.running = False
+   def _wait_for_input(self):
+      """
+      Sleeps until there is input or the game next needs an update, if
+      nothing is due before the next frame.  Returns True if it slept.
+      """
       
-            
+      if self.wake_time is None or self.pygame_events_manager is None:
+         return False
+         
+      #input is already waiting
+      if pygame.event.peek():
+         return False
+         
+      wake_time = self.wake_time()
+      now = monotonic()
+      
+      if wake_time is None:
+         timeout = MAX_IDLE_WAIT
+      else:
+         timeout = min(wake_time-now,MAX_IDLE_WAIT)
+         
+      #due before the next frame anyway
+      if self.fps and timeout <= 1.0/self.fps:
+         return False
+      if not self.fps and timeout <= 0:
+         return False
+         
+      try:
+         event = pygame.event.wait(int(timeout*1000))
+      except TypeError:
+         #pygame before 2.0.1 can't wait with a timeout, so check for input
+         #a few times a second instead
+         pygame.time.wait(int(min(timeout,0.1)*1000))
+         return True
+         
+      #the event is taken off the queue by waiting.  Posting it back would
+      #put it behind anything queued since, so it is handed over instead.
+      if event.type != pygame.NOEVENT:
+         self.pygame_events_manager.push(event)
+         
+      return True
       
+   #--------------------------------------------------------------------------
+   
+   def _update(self):
+      """
+      Posts the tick event for one game update.
+      """
+      self.system_event_manager.post(TICK_EVENT)
+      
+      #in queued mode this is where the update's events get dispatched
+      self.system_event_manager.drain()
+         
+   #--------------------------------------------------------------------------
+   
+   def notify(self,event):
+      if isinstance(event,QuitEvent):
+         self.running = False
\ No newline at end of file
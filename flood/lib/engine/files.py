@@ -0,0 +1,22 @@
+##############################################################################
+# files.py
+##############################################################################
+# Helpers for writing files that other processes may be reading.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+import os
+
+def replace_file(src,dst):
+   """
+   Renames 'src' over 'dst'.  os.rename won't replace an existing file on
+   windows before python 3.3.
+   """
+
+   if hasattr(os,"replace"):
+      os.replace(src,dst)
+   else:
+      if os.name == "nt" and os.path.exists(dst):
+         os.remove(dst)
+      os.rename(src,dst)
@@ -8,20 +8,84 @@
 ##############################################################################
 
 import pygame
-from systemevents import *
+from .systemevents import *
+from .timing import monotonic
 
 class Model(SystemEventListener):
 
+   #the system events the current state wants are passed on to it, see
+   #update_event_types
+   event_types = None
+
    def __init__(self,system_event_manager,screen_size):
       SystemEventListener.__init__(self,system_event_manager)
       self.system_event_manager = system_event_manager
       
       self.screen_size = screen_size
+      
+      #set by change_state
+      self.state = None
+      
+      #posted for every frame so the same event is reused each time
+      self.model_updated = ModelUpdated(None)
    
    #--------------------------------------------------------------------------
    
    def change_state(self,new_state):
+   
       self.state = new_state
+      self.update_event_types()
+      
+   #--------------------------------------------------------------------------
+   
+   def start_state(self,state_class,*args,**kwargs):
+      """
+      Changes to a new state_class(model, *args, **kwargs).  Making the
+      state, e.g. dealing a board, is most of the cost of a state change,
+      so when profiling the time is recorded from before it is made.
+      """
+      
+      profiler = self.system_event_manager.profiler
+      
+      if profiler is None:
+         self.change_state(state_class(self,*args,**kwargs))
+         return
+         
+      #state changes are counted by the class of state changed to
+      start = monotonic()
+      self.change_state(state_class(self,*args,**kwargs))
+      profiler.record("Model","change_state to "+state_class.__name__,
+                      monotonic()-start)
+      
+   #--------------------------------------------------------------------------
+   
+   def update_event_types(self):
+      """
+      Listens for the system events the current state wants.  Must be 
+      called when the state changes its system_event_types.
+      """
+      
+      event_types = getattr(self.state,'system_event_types',None)
+      
+      if event_types is not None:
+         event_types = (TickEvent,RenderEvent)+tuple(event_types)
+         
+      if event_types != self.event_types:
+         self.event_types = event_types
+         self.system_event_manager.event_types_changed()
+      
+   #--------------------------------------------------------------------------
+   
+   def wake_time(self):
+      """
+      Returns when the current state next needs an update without input,
+      see State.wake_time.
+      """
+      
+      if self.state is None:
+         return None
+         
+      return self.state.wake_time()
       
    #--------------------------------------------------------------------------
       
@@ -29,6 +93,7 @@ class Model(SystemEventListener):
       if self.state is not None:
          self.state.notify(event)
          
-         if isinstance(event,TickEvent):
-            self.system_event_manager.post(
-                                 ModelUpdated(self.state.get_game_objects()))   
\ No newline at end of file
+         if isinstance(event,RenderEvent):
+            self.model_updated.game_objects = self.state.get_game_objects()
+            self.model_updated.viewport = self.state.viewport
+            self.system_event_manager.post(self.model_updated)   
\ No newline at end of file
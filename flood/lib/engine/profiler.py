@@ -0,0 +1,184 @@
+##############################################################################
+# profiler.py
+##############################################################################
+# Times every listener called by the event managers, state changes and
+# render passes, so a slow frame can be traced to the code that caused it.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+import json
+
+from collections import deque
+
+from .files import replace_file
+from .timing import monotonic
+
+##############################################################################
+# TIMING
+##############################################################################
+
+class Timing:
+   """
+   The number of calls and total time of one thing being timed, and the
+   times of its last 'size' calls for percentiles.
+   """
+
+   def __init__(self,size):
+      self.count = 0
+      self.total = 0.0
+      self.worst = 0.0
+      self.samples = deque(maxlen=size)
+
+   #--------------------------------------------------------------------------
+
+   def record(self,seconds):
+      self.count += 1
+      self.total += seconds
+      self.samples.append(seconds)
+
+      if seconds > self.worst:
+         self.worst = seconds
+
+   #--------------------------------------------------------------------------
+
+   def summary(self):
+      """
+      Returns a dictionary of the calls, total and mean time, the 50th, 95th
+      and 99th percentile of recent calls and the worst call.  Times are in
+      ms.
+      """
+
+      samples = sorted(self.samples)
+      last = len(samples)-1
+
+      summary = {
+         "count": self.count,
+         "total": self.total*1000.0,
+         "mean": self.total*1000.0/self.count,
+         "max": self.worst*1000.0,
+      }
+
+      for percent in (50,95,99):
+         idx = int(round(last*percent/100.0))
+         summary["p%d" % percent] = samples[idx]*1000.0
+
+      return summary
+
+##############################################################################
+# PROFILER
+##############################################################################
+
+class Profiler:
+   """
+   Collects timings keyed on (section, name), e.g. a listener class and the
+   class of event it was notified of.
+
+   The event managers time their listeners when EventManager.profiler is
+   set to a Profiler and skip all timing when it is None, so the hooks cost
+   a single attribute check when profiling is off.
+
+   If 'dump_path' is given the summary is written to it as JSON every
+   'dump_interval' seconds, checked at the end of each frame.
+   """
+
+   def __init__(self,dump_path=None,dump_interval=10.0,size=600):
+      self.dump_path = dump_path
+      self.dump_interval = dump_interval
+      self.size = size
+
+      #(section, name) -> Timing
+      self.timings = {}
+
+      self.next_dump = monotonic()+dump_interval
+
+   #--------------------------------------------------------------------------
+
+   def record(self,section,name,seconds):
+
+      key = (section,name)
+
+      try:
+         timing = self.timings[key]
+      except KeyError:
+         timing = self.timings[key] = Timing(self.size)
+
+      timing.record(seconds)
+
+   #--------------------------------------------------------------------------
+
+   def record_call(self,listener,event,seconds):
+      """
+      Records the time a listener took to handle an event, or a list of
+      events for notify_batch.  The time of a batch is shared between the
+      classes of event in it by how many of each there are.
+      """
+
+      section = listener.__class__.__name__
+
+      if not isinstance(event,list):
+         self.record(section,event.__class__.__name__,seconds)
+         return
+
+      counts = {}
+
+      for batch_event in event:
+         name = batch_event.__class__.__name__+" batch"
+         counts[name] = counts.get(name,0)+1
+
+      for name, count in counts.items():
+         self.record(section,name,seconds*count/len(event))
+
+   #--------------------------------------------------------------------------
+
+   def end_frame(self,render_seconds):
+      """
+      Records the time the frame's render pass took and writes the dump
+      file if it is due.
+      """
+
+      self.record("frame","render pass",render_seconds)
+
+      if self.dump_path is not None and monotonic() >= self.next_dump:
+         self.dump()
+
+   #--------------------------------------------------------------------------
+
+   def snapshot(self):
+      """
+      Returns a dictionary of (section, name) to the summary of its timing,
+      see Timing.summary.
+      """
+      return dict((key, timing.summary())
+                  for key, timing in self.timings.items())
+
+   #--------------------------------------------------------------------------
+
+   def dump(self,path=None):
+      """
+      Writes the summary of every timing to 'path', or 'dump_path', as a
+      JSON list sorted by total time, most first.
+      """
+
+      if path is None:
+         path = self.dump_path
+
+      rows = []
+
+      for (section, name), summary in self.snapshot().items():
+         summary["section"] = section
+         summary["name"] = name
+         rows.append(summary)
+
+      rows.sort(key=lambda row: row["total"],reverse=True)
+
+      #written to a temporary file first so a reader never sees half a dump
+      temp_path = path+".tmp"
+
+      dump_file = open(temp_path,"w")
+      json.dump(rows,dump_file,indent=1,sort_keys=True)
+      dump_file.close()
+
+      replace_file(temp_path,path)
+
+      self.next_dump = monotonic()+self.dump_interval
@@ -7,10 +7,37 @@
 # 06/12 - GoshDarnGames
 ##############################################################################
 
-from systemevents import *
+from .systemevents import *
 import pygame
 
+#system event posted for each type of pygame event
+EVENT_CLASSES = {
+   pygame.QUIT: QuitEvent,
+   pygame.KEYDOWN: KeyboardEvent,
+   pygame.KEYUP: KeyboardEvent,
+   pygame.MOUSEBUTTONDOWN: MouseButtonEvent,
+   pygame.MOUSEBUTTONUP: MouseButtonEvent,
+   pygame.MOUSEMOTION: MouseMotionEvent,
+}
+
+#pygame input events that are never posted, so are always left in pygame.
+#Not every version of pygame has all of them.
+UNUSED_EVENT_TYPES = [getattr(pygame,name) for name in
+                      ("TEXTINPUT","TEXTEDITING","MOUSEWHEEL",
+                       "JOYAXISMOTION","JOYBALLMOTION","JOYHATMOTION",
+                       "JOYBUTTONDOWN","JOYBUTTONUP","FINGERMOTION",
+                       "FINGERDOWN","FINGERUP","MULTIGESTURE")
+                      if hasattr(pygame,name)]
+
 class PygameEventsManager(SystemEventListener):
+   """
+   Only pygame events some listener wants are posted.  Pygame is told to
+   block the other types so they never reach its queue, which matters most
+   for mouse motion.  What is wanted is checked again whenever the system
+   event manager's listeners change.
+   """
+
+   event_types = (TickEvent,)
 
    def __init__(self,system_event_manager):
    
@@ -19,45 +46,102 @@ class PygameEventsManager(SystemEventListener):
       #save reference to events manager for posting system events
       self.system_event_manager = system_event_manager
       
+      #whether pygame is checked for events on each tick.  Turned off when
+      #something else calls poll(), e.g. the asyncio driver.
+      self.poll_on_tick = True
+      
+      #version of the system event manager's listeners the blocked event
+      #types were worked out for
+      self.filter_version = None
+      
+      #pygame events taken off pygame's queue by something else, posted
+      #ahead of pygame's queue by the next poll
+      self.pending = []
+      
    #--------------------------------------------------------------------------
       
    def notify(self,event):
    
-      if isinstance(event,TickEvent):
-      
-         #get most recent pygame events
-         pygame_events = pygame.event.get()         
-         
-         #convert pygame events into system events
-         for pygame_event in pygame_events:
+      if isinstance(event,TickEvent) and self.poll_on_tick:
+         self.poll()
          
-            event_to_post = None
-         
-            #pygame quit (window closing)
-            if pygame_event.type == pygame.QUIT:
-               event_to_post = QuitEvent()
-               
-            #keyboard event
-            if pygame_event.type == pygame.KEYDOWN or \
-               pygame_event.type == pygame.KEYUP:
-               
-               event_to_post = KeyboardEvent(pygame_event.type,
-                                             pygame_event.key)
-               
-            #mouse button event
-            if pygame_event.type == pygame.MOUSEBUTTONUP or \
-               pygame_event.type == pygame.MOUSEBUTTONDOWN:
-               
-               event_to_post = MouseButtonEvent(pygame_event.type,
-                                                pygame_event.button,
-                                                pygame_event.pos)
-                                                
-            #mouse motion event
-            if pygame_event.type == pygame.MOUSEMOTION:
-               event_to_post = MouseMotionEvent(pygame_event.pos,
-                                                pygame_event.rel,
-                                                pygame_event.buttons)
+   #--------------------------------------------------------------------------
+   
+   def update_filter(self):
+      """
+      Allows the pygame events that have listeners and blocks the rest.
+      """
+      
+      allowed = []
+      blocked = list(UNUSED_EVENT_TYPES)
+      
+      for event_type, event_class in EVENT_CLASSES.items():
+         if self.system_event_manager.has_listeners(event_class):
+            allowed.append(event_type)
+         else:
+            blocked.append(event_type)
             
-            #post the event that has been generated
+      pygame.event.set_allowed(allowed)
+      pygame.event.set_blocked(blocked)
+      
+      self.filter_version = self.system_event_manager.version
+      
+   #--------------------------------------------------------------------------
+   
+   def push(self,pygame_event):
+      """
+      Passes on 'pygame_event' with the next poll, before any events still
+      in pygame's queue.
+      """
+      self.pending.append(pygame_event)
+      
+   #--------------------------------------------------------------------------
+   
+   def poll(self):
+      """
+      Posts system events for the pygame events since the last poll.
+      """
+      
+      if self.filter_version != self.system_event_manager.version:
+         self.update_filter()
+      
+      #get most recent pygame events
+      pygame_events = pygame.event.get()
+      
+      if self.pending:
+         pygame_events = self.pending+pygame_events
+         self.pending = []
+      
+      #convert pygame events into system events
+      for pygame_event in pygame_events:
+      
+         event_to_post = None
+      
+         #pygame quit (window closing)
+         if pygame_event.type == pygame.QUIT:
+            event_to_post = QUIT_EVENT
+            
+         #keyboard event
+         elif pygame_event.type == pygame.KEYDOWN or \
+              pygame_event.type == pygame.KEYUP:
+            
+            event_to_post = KeyboardEvent(pygame_event.type,
+                                          pygame_event.key)
+            
+         #mouse button event
+         elif pygame_event.type == pygame.MOUSEBUTTONUP or \
+              pygame_event.type == pygame.MOUSEBUTTONDOWN:
+            
+            event_to_post = MouseButtonEvent(pygame_event.type,
+                                             pygame_event.button,
+                                             pygame_event.pos)
+                                             
+         #mouse motion event
+         elif pygame_event.type == pygame.MOUSEMOTION:
+            event_to_post = MouseMotionEvent(pygame_event.pos,
+                                             pygame_event.rel,
+                                             pygame_event.buttons)
+         
+         #other pygame events, e.g. window events, aren't passed on
+         if event_to_post is not None:
             self.system_event_manager.post(event_to_post)
-               
\ No newline at end of file
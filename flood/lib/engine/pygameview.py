@@ -8,13 +8,27 @@
 
 import os
 import pygame
-from systemevents import *
+from .systemevents import *
+from .timing import monotonic
+
+#number of rects over which they are merged into one before updating the
+#display
+MAX_DIRTY_RECTS = 64
 
 class PygameView(SystemEventListener):
+   """
+   Draws the game objects of the model's state.  If the state has a
+   viewport, objects in the world are drawn onto a world surface and the
+   part of it in view is scaled onto the screen.  Other objects are drawn
+   straight onto the screen on top of it.
+   """
+   
+   event_types = (ModelUpdated,)
    
    def __init__(self,system_event_manager,caption,size,bg_color):
    
       SystemEventListener.__init__(self,system_event_manager)
+      self.system_event_manager = system_event_manager
       
       os.environ["SDL_VIDEO_CENTERED"] = "1"
       pygame.display.set_caption(caption)
@@ -22,16 +36,148 @@ class PygameView(SystemEventListener):
       
       self.bg_color = bg_color
       
+      #list of game objects drawn last frame.  A different list means the
+      #model changed state and the whole screen has to be redrawn.
+      self.drawn_objects = None
+      
+      #viewport used last frame and its version when it was drawn
+      self.drawn_viewport = None
+      self.drawn_version = None
+      
+      #surface objects in the world are drawn on, created when needed
+      self.world = None
+      
    #--------------------------------------------------------------------------
       
    def notify(self, event):
       
       if isinstance(event,ModelUpdated):
+      
+         game_objects = event.game_objects
+         viewport = event.viewport
+      
+         if game_objects is not self.drawn_objects or \
+            viewport is not self.drawn_viewport:
+            self._redraw(game_objects,viewport)
+            return
+            
+         #draw only what each object says has changed
+         dirty_rects = []
+         
+         if viewport is not None:
+            world_rects = []
+            
+            for game_object in game_objects:
+               if game_object.in_world:
+                  rects = game_object.render_dirty(self.world)
+                  
+                  if rects is None:
+                     self._redraw(game_objects,viewport)
+                     return
+                     
+                  world_rects.extend(rects)
+                  
+            #the view has moved so show the world again from scratch
+            if viewport.version != self.drawn_version:
+               self._show_world(game_objects,viewport)
+               self._update_display()
+               return
+               
+            if world_rects:
+               dirty_rects.extend(viewport.draw(self.world,self.screen,
+                                                world_rects))
          
-         self.screen.fill(self.bg_color)
+         for game_object in game_objects:
+            if viewport is not None and game_object.in_world:
+               continue
+               
+            rects = game_object.render_dirty(self.screen)
+            
+            if rects is None:
+               self._redraw(game_objects,viewport)
+               return
+               
+            dirty_rects.extend(rects)
+            
+         #nothing changed so leave the display alone this frame
+         if not dirty_rects:
+            return
+            
+         #one big update is cheaper than lots of little ones
+         if len(dirty_rects) > MAX_DIRTY_RECTS:
+            dirty_rects = [dirty_rects[0].unionall(dirty_rects)]
+            
+         self._update_display(dirty_rects)
+         
+   #--------------------------------------------------------------------------
+   
+   def notify_batch(self,events):
+      """
+      Only the latest model update in a batch needs drawing.
+      """
+      self.notify(events[-1])
+         
+   #--------------------------------------------------------------------------
+         
+   def _redraw(self,game_objects,viewport):
+      """
+      Draws every game object from scratch.
+      """
+      
+      if viewport is not None:
+      
+         if self.world is None or \
+            self.world.get_size() != tuple(viewport.world_size):
+            self.world = pygame.Surface(viewport.world_size,0,self.screen)
+            
+         self.world.fill(self.bg_color)
+         
+         for game_object in game_objects:
+            if game_object.in_world:
+               game_object.render(self.world)
+               
+      self._show_world(game_objects,viewport)
+         
+      self._update_display()
+      
+      self.drawn_objects = game_objects
+      self.drawn_viewport = viewport
+      
+   #--------------------------------------------------------------------------
+   
+   def _show_world(self,game_objects,viewport):
+      """
+      Clears the screen, draws the part of the world in view and draws the
+      objects that aren't in the world on top.
+      """
+      
+      self.screen.fill(self.bg_color)
       
-         for game_object in event.game_objects:
+      if viewport is not None:
+         viewport.draw(self.world,self.screen)
+         self.drawn_version = viewport.version
+   
+      for game_object in game_objects:
+         if viewport is None or not game_object.in_world:
             game_object.render(self.screen)
             
+   #--------------------------------------------------------------------------
+   
+   def _update_display(self,rects=None):
+      """
+      Updates 'rects' of the display, or flips the whole display if 'rects'
+      isn't given.  Timed separately from drawing when profiling.
+      """
+      
+      profiler = self.system_event_manager.profiler
+      
+      if profiler is not None:
+         start = monotonic()
+      
+      if rects is None:
          pygame.display.flip()
-      
\ No newline at end of file
+      else:
+         pygame.display.update(rects)
+         
+      if profiler is not None:
+         profiler.record("PygameView","display update",monotonic()-start)
@@ -7,7 +7,7 @@
 # 06/12 - GoshDarnGames
 ##############################################################################
 
-from abs.events import *
+from .abs.events import *
 
 ##############################################################################
 # EVENTS
@@ -17,13 +17,19 @@ class TickEvent(Event):
    """
    Generated by the CPU Spinner when a game loop occurs
    """
-   pass
+   __slots__ = ()
+   
+class RenderEvent(Event):
+   """
+   Generated by the CPU Spinner when a frame should be drawn.
+   """
+   __slots__ = ()
    
 class QuitEvent(Event):
    """
    Generated by the model when the user tries to quit the game.
    """
-   pass
+   __slots__ = ()
    
 class KeyboardEvent(Event):
    """
@@ -31,6 +37,8 @@ class KeyboardEvent(Event):
    key.
    """   
    
+   __slots__ = ('type','key')
+   
    def __init__(self,type,key):
       """
       type - pygame.KEYUP or pygame.KEYDOWN
@@ -46,6 +54,8 @@ class MouseButtonEvent(Event):
    a mouse button.
    """
    
+   __slots__ = ('type','button','pos')
+   
    def __init__(self,type,button,pos):
       """
       type - pygame.MOUSEBUTTONUP or pygame.MOUSEBUTTONDOWN
@@ -60,8 +70,13 @@ class MouseButtonEvent(Event):
 class MouseMotionEvent(Event):
    """
    Generated by the pygame event monitor when the user moves the mouse.
+   Only the latest position matters so queued motion events coalesce.
    """
    
+   __slots__ = ('pos','rel','buttons')
+   
+   coalesce = True
+   
    def __init__(self,pos,rel,buttons):
       """
       pos - new position of the mouse
@@ -75,17 +90,33 @@ class MouseMotionEvent(Event):
       
 class ModelUpdated(Event):
    """
-   Generated by the model after it processes a tick event.
+   Generated by the model when it is asked to render a frame.  The model 
+   reuses one instance, changing game_objects each time.
    """
    
-   def __init__(self,game_objects):
+   __slots__ = ('game_objects','viewport')
+   
+   def __init__(self,game_objects,viewport=None):
       """
       game_objects - list of Game Objects that are tracked by the model.  
                      These will be drawn in this order by the default 
                      pygame view.
+      viewport     - Viewport that objects in the world are shown through,
+                     or None
       """
    
       self.game_objects = game_objects
+      self.viewport = viewport
+      
+##############################################################################
+# SHARED EVENTS
+##############################################################################
+# Events that carry no data never change, so these instances are posted
+# instead of creating new ones.
+
+TICK_EVENT = TickEvent()
+RENDER_EVENT = RenderEvent()
+QUIT_EVENT = QuitEvent()
 
 ##############################################################################
 # LISTENER
@@ -0,0 +1,131 @@
+##############################################################################
+# text.py
+##############################################################################
+# Loads each font once and keeps the surfaces of recently drawn text, so
+# screens built from many lines of text, and text drawn every frame, don't
+# pay for a font lookup and render each time.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+import pygame
+
+from collections import OrderedDict
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+#font used when none is given
+DEFAULT_FACE = "courier"
+DEFAULT_SIZE = 24
+DEFAULT_BOLD = True
+
+#number of text surfaces kept by the shared text cache
+TEXT_CACHE_SIZE = 256
+
+##############################################################################
+# FONT REGISTRY
+##############################################################################
+
+#(face, size, bold) -> pygame.font.Font
+_fonts = {}
+
+def get_font(face=DEFAULT_FACE,size=DEFAULT_SIZE,bold=DEFAULT_BOLD):
+   """
+   Returns the system font 'face' at 'size', looking it up and loading it
+   the first time it is asked for.
+   """
+
+   key = (face,size,bold)
+
+   if key not in _fonts:
+      _fonts[key] = pygame.font.SysFont(face,size,bold)
+
+   return _fonts[key]
+
+##############################################################################
+# TEXT CACHE
+##############################################################################
+
+class TextCache:
+   """
+   Keeps the last 'max_entries' text surfaces rendered, keyed on the text,
+   font and colour.  When it is full the surface used least recently is
+   dropped.  'hits' and 'misses' count the renders that were and weren't
+   found in the cache.
+
+   Surfaces are shared by everything drawing the same text, so they must
+   not be drawn onto.
+   """
+
+   def __init__(self,max_entries=TEXT_CACHE_SIZE):
+      self.max_entries = max_entries
+
+      #key -> surface, least recently used first
+      self.surfaces = OrderedDict()
+
+      self.hits = 0
+      self.misses = 0
+
+   #--------------------------------------------------------------------------
+
+   def render(self,text,color,face=DEFAULT_FACE,size=DEFAULT_SIZE,
+              bold=DEFAULT_BOLD):
+      """
+      Returns a surface of 'text' drawn anti-aliased in 'color'.
+      """
+
+      key = (text,face,size,bold,tuple(color))
+
+      surface = self.surfaces.pop(key,None)
+
+      if surface is None:
+         self.misses += 1
+         surface = get_font(face,size,bold).render(text,True,color)
+
+         if self.surfaces and len(self.surfaces) >= self.max_entries:
+            self.surfaces.popitem(False)
+      else:
+         self.hits += 1
+
+      #put back at the most recently used end
+      self.surfaces[key] = surface
+
+      return surface
+
+   #--------------------------------------------------------------------------
+
+   def clear(self):
+      """
+      Drops every surface and resets the counters.
+      """
+
+      self.surfaces.clear()
+      self.hits = 0
+      self.misses = 0
+
+   #--------------------------------------------------------------------------
+
+   def stats(self):
+      """
+      Returns a dict of the number of surfaces kept, hits and misses.
+      """
+      return {"entries": len(self.surfaces), "hits": self.hits,
+              "misses": self.misses}
+
+#-----------------------------------------------------------------------------
+
+_text_cache = None
+
+def get_text_cache():
+   """
+   Returns the text cache shared by the whole game.
+   """
+
+   global _text_cache
+
+   if _text_cache is None:
+      _text_cache = TextCache()
+
+   return _text_cache
@@ -0,0 +1,108 @@
+##############################################################################
+# timing.py
+##############################################################################
+# A monotonic clock and a rolling record of where each frame's time goes.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+from collections import deque
+
+try:
+   from time import monotonic
+except ImportError:
+   #python 2 has no monotonic clock in the standard library
+   from time import time as monotonic
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+#the parts of a frame that are timed
+PHASES = ("update","render","idle")
+
+##############################################################################
+# FRAME STATS
+##############################################################################
+
+class FrameStats:
+   """
+   Keeps the time spent updating, rendering and idling in each of the last
+   'size' frames.  Times are recorded in seconds and reported in
+   milliseconds.
+   """
+
+   def __init__(self,size=600):
+      self.samples = {}
+
+      for phase in PHASES:
+         self.samples[phase] = deque(maxlen=size)
+
+   #--------------------------------------------------------------------------
+
+   def record(self,update,render,idle):
+      """
+      Records the seconds one frame spent in each phase.
+      """
+      self.samples["update"].append(update)
+      self.samples["render"].append(render)
+      self.samples["idle"].append(idle)
+
+   #--------------------------------------------------------------------------
+
+   def percentile(self,phase,percent):
+      """
+      Returns the time in ms that 'percent' of recorded frames spent no
+      more than in 'phase', or None if no frames have been recorded.
+      """
+
+      samples = sorted(self.samples[phase])
+
+      if not samples:
+         return None
+
+      idx = int(round((len(samples)-1)*percent/100.0))
+      return samples[idx]*1000.0
+
+   #--------------------------------------------------------------------------
+
+   def histogram(self,phase,bucket_ms=1.0):
+      """
+      Returns a list of (bucket start in ms, number of frames) for the times
+      spent in 'phase', skipping empty buckets.
+      """
+
+      counts = {}
+
+      for seconds in self.samples[phase]:
+         bucket = int(seconds*1000.0/bucket_ms)
+         counts[bucket] = counts.get(bucket,0)+1
+
+      return [(bucket*bucket_ms, counts[bucket])
+              for bucket in sorted(counts)]
+
+   #--------------------------------------------------------------------------
+
+   def summary(self):
+      """
+      Returns a dictionary of phase to a dictionary of the mean, median,
+      95th and 99th percentile and worst time in ms.
+      """
+
+      summary = {}
+
+      for phase in PHASES:
+         samples = self.samples[phase]
+
+         if not samples:
+            continue
+
+         summary[phase] = {
+            "mean": sum(samples)*1000.0/len(samples),
+            "p50": self.percentile(phase,50),
+            "p95": self.percentile(phase,95),
+            "p99": self.percentile(phase,99),
+            "max": max(samples)*1000.0,
+         }
+
+      return summary
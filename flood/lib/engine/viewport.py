@@ -0,0 +1,202 @@
+##############################################################################
+# viewport.py
+##############################################################################
+# The part of a game world that is shown on screen, for worlds too big to
+# fit on it.  The view can be scrolled and zoomed.
+##############################################################################
+# 10/26 - GoshDarnGames
+##############################################################################
+
+import math
+import pygame
+
+##############################################################################
+# VIEWPORT
+##############################################################################
+
+class Viewport:
+   """
+   Maps the pixels of a world surface onto an area of the screen.  The view
+   is described by the world position shown at the top-left of that area
+   and a zoom, the number of screen pixels per world pixel.  The zoom can't
+   go below the level where the whole world fits.
+
+   Anything that changes the view adds one to 'version' so a view can tell
+   when it has to redraw.
+   """
+
+   def __init__(self,world_size,view_rect,max_zoom=16.0):
+      """
+      world_size - (width, height) of the world surface in pixels
+      view_rect  - area of the screen the world is shown in
+      max_zoom   - largest number of screen pixels per world pixel
+      """
+
+      self.world_size = world_size
+      self.view_rect = pygame.Rect(view_rect)
+
+      #zoom that fits the whole world in the view
+      fit = min(float(self.view_rect.width)/world_size[0],
+                float(self.view_rect.height)/world_size[1])
+
+      self.min_zoom = min(fit,1.0)
+      self.max_zoom = max(max_zoom,self.min_zoom)
+      self.zoom = min(fit,self.max_zoom)
+
+      self.x = 0.0
+      self.y = 0.0
+
+      self.version = 0
+      self._clamp()
+
+   #--------------------------------------------------------------------------
+
+   def scroll(self,dx,dy):
+      """
+      Moves the view by (dx, dy) screen pixels.
+      """
+
+      self.x += dx/self.zoom
+      self.y += dy/self.zoom
+
+      self._clamp()
+
+   #--------------------------------------------------------------------------
+
+   def zoom_at(self,factor,pos=None):
+      """
+      Multiplies the zoom by 'factor' keeping the world point under the
+      screen position 'pos' in place.  Zooms around the middle of the view
+      if 'pos' isn't given.
+      """
+
+      if pos is None:
+         pos = self.view_rect.center
+
+      world_x, world_y = self._to_world(pos)
+
+      self.zoom = max(self.min_zoom,min(self.zoom*factor,self.max_zoom))
+
+      self.x = world_x-(pos[0]-self.view_rect.left)/self.zoom
+      self.y = world_y-(pos[1]-self.view_rect.top)/self.zoom
+
+      self._clamp()
+
+   #--------------------------------------------------------------------------
+
+   def to_world(self,pos):
+      """
+      Returns the world position under the screen position 'pos', or None if
+      'pos' isn't over the world.
+      """
+
+      if not self.view_rect.collidepoint(pos):
+         return None
+
+      world_x, world_y = self._to_world(pos)
+
+      if not (0 <= world_x < self.world_size[0] and
+              0 <= world_y < self.world_size[1]):
+         return None
+
+      return (world_x, world_y)
+
+   #--------------------------------------------------------------------------
+
+   def source_rect(self):
+      """
+      Returns the rect of whole world pixels that covers the view.
+      """
+
+      left = int(math.floor(self.x))
+      top = int(math.floor(self.y))
+      right = int(math.ceil(self.x+self.view_rect.width/self.zoom))
+      bottom = int(math.ceil(self.y+self.view_rect.height/self.zoom))
+
+      return pygame.Rect(left,top,right-left,bottom-top).clip(
+                               pygame.Rect((0,0),self.world_size))
+
+   #--------------------------------------------------------------------------
+
+   def to_screen(self,rect):
+      """
+      Returns the screen rect covered by the world rect 'rect'.
+      """
+
+      left = self.view_rect.left+int(round((rect.left-self.x)*self.zoom))
+      top = self.view_rect.top+int(round((rect.top-self.y)*self.zoom))
+      right = self.view_rect.left+int(round((rect.right-self.x)*self.zoom))
+      bottom = self.view_rect.top+int(round((rect.bottom-self.y)*self.zoom))
+
+      return pygame.Rect(left,top,right-left,bottom-top)
+
+   #--------------------------------------------------------------------------
+
+   def draw(self,world,screen,rects=None):
+      """
+      Draws the parts of the 'world' surface inside the world 'rects' onto
+      the screen, or the whole view if 'rects' isn't given.  Returns the
+      screen rects drawn to.
+
+      Parts are only drawn on their own when the zoom is a whole number, so
+      they line up exactly with the pixels around them.  Otherwise the whole
+      view is drawn again.
+      """
+
+      source = self.source_rect()
+
+      if rects is None or self.zoom != int(self.zoom):
+         rects = [source]
+      else:
+         rects = [rect.clip(source) for rect in rects]
+
+      clip = screen.get_clip()
+      screen.set_clip(self.view_rect)
+
+      drawn = []
+
+      for rect in rects:
+
+         if not rect.width or not rect.height:
+            continue
+
+         dest = self.to_screen(rect)
+         scaled = pygame.transform.scale(world.subsurface(rect),dest.size)
+
+         drawn.append(screen.blit(scaled,dest))
+
+      screen.set_clip(clip)
+
+      return drawn
+
+   #--------------------------------------------------------------------------
+
+   def _to_world(self,pos):
+      return (self.x+(pos[0]-self.view_rect.left)/self.zoom,
+              self.y+(pos[1]-self.view_rect.top)/self.zoom)
+
+   #--------------------------------------------------------------------------
+
+   def _clamp(self):
+      """
+      Keeps the view over the world, centring the world along any side
+      where it is smaller than the view.
+      """
+
+      self.x = self._clamp_axis(self.x,self.view_rect.width,
+                                self.world_size[0])
+      self.y = self._clamp_axis(self.y,self.view_rect.height,
+                                self.world_size[1])
+
+      self.version += 1
+
+   #--------------------------------------------------------------------------
+
+   def _clamp_axis(self,position,view_size,world_size):
+
+      view_size = view_size/self.zoom
+
+      if view_size >= world_size:
+         return (world_size-view_size)/2.0
+
+      return max(0.0,min(position,world_size-view_size))
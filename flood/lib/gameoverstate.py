@@ -9,9 +9,11 @@
 import pygame
 import os
 
-from engine.abs.gameobject import GameObject
-from engine.abs.state import State
-from engine.systemevents import *
+from .engine.abs.gameobject import GameObject
+from .engine.abs.state import State
+from .engine.systemevents import *
+from .engine.text import get_text_cache
+from .scorestore import get_score_store
 
 ##############################################################################
 # CONSTANTS
@@ -41,8 +43,18 @@ NEW_BEST_TIME_COLOR = NEW_HIGH_SCORE_COLOR
 ANY_KEY_TXT_Y = 440
 ANY_KEY_COLOR = (255,0,255)
 
+#scores are kept by the score store.  The old single score file is only
+#read for the default board's high score until a game on it has been
+#recorded.
 HIGH_SCORE_FILE = os.path.join("data","high_score.txt")
 
+#board scores are recorded under when none is given
+DEFAULT_BOARD = "12x12"
+
+#times are recorded as this many frames a second, whatever the frame rate
+#the game runs at, so they compare with the frames the old score file holds
+FRAMES_PER_SECOND = 60
+
 #GLOBAL SCREEN SIZE FOR TEXT CENTERING
 SCREEN_SIZE = None
 
@@ -64,13 +76,23 @@ class TextObject(GameObject):
       
       self.screen_width = screen_width
    
-      self.surf = pygame.font.SysFont("courier",24,True).\
-                                                     render(text,True,(color))
+      self.surf = get_text_cache().render(text,color)
       self.pos = (self._center_text(self.surf),y)
       
+      #the text never changes so it only needs drawing once
+      self.drawn = False
+      
    def render(self,screen):
       
-      screen.blit(self.surf,self.pos)
+      self.drawn = True
+      return screen.blit(self.surf,self.pos)
+      
+   def render_dirty(self,screen):
+      
+      if self.drawn:
+         return []
+         
+      return [self.render(screen)]
       
    def _center_text(self,surf):
       """
@@ -87,15 +109,46 @@ class TextObject(GameObject):
 
 class GameOverState(State,SystemEventListener):
    
-   def __init__(self,model,click_count,fps,frames_elapsed):
+   #only a key press is needed to start the next game
+   system_event_types = (KeyboardEvent,)
+   
+   def __init__(self,model,click_count,fps,frames_elapsed,board=None,
+                seed=None,game_options=None):
+      """
+      board        - name of the board played, see scorestore.board_name
+      seed         - seed the board was generated from, if any
+      game_options - keyword arguments for the GameState of the next game
+      """
       
       State.__init__(self,model)
       
       screen_width = self.model.screen_size[0]
       self.fps = fps
       
+      if game_options is None:
+         game_options = {}
+         
+      self.game_options = game_options
+      
+      if board is None:
+         board = DEFAULT_BOARD
+      
       #read old best time and score
-      old_score_and_time = self._read_high_score()
+      score_store = get_score_store()
+      old_score_and_time = score_store.best(board)
+      
+      #the old score file only ever held scores for the default board
+      if old_score_and_time is None and board == DEFAULT_BOARD:
+         old_score_and_time = self._read_high_score()
+         
+      #every game is recorded for the leaderboards
+      score_store.add(board,click_count,frames_elapsed,seed)
+      score_store.flush()
+      
+      #the first game on a board is its high score
+      if old_score_and_time is None:
+         old_score_and_time = (click_count,frames_elapsed)
+         
       old_high_score = int(old_score_and_time[0])
       old_best_time = int(old_score_and_time[1])
       
@@ -103,13 +156,11 @@ class GameOverState(State,SystemEventListener):
       new_high_score = False  
       if click_count < old_high_score:
          new_high_score = True
-         self._write_high_score(click_count,frames_elapsed)
          
       #check for new best time
       new_best_time = False
       if frames_elapsed < old_best_time and click_count == old_high_score:
          new_best_time = True
-         self._write_high_score(old_high_score,frames_elapsed)
          
       
       
@@ -184,17 +235,27 @@ class GameOverState(State,SystemEventListener):
       
       if isinstance(event,KeyboardEvent):
       
+         #quitting, so there is no next game to start or record
          if event.key == pygame.K_ESCAPE:
-            self.model.system_event_manager.post(QuitEvent())
+            self.model.system_event_manager.post(QUIT_EVENT)
+            return
          
-         from gamestate import GameState
-         self.model.change_state(GameState(self.model,self.fps))
+         from .gamestate import GameState
+         self.model.start_state(GameState,self.fps,**self.game_options)
+         
+   #--------------------------------------------------------------------------
+   
+   def wake_time(self):
+      """
+      Nothing changes until a key is pressed.
+      """
+      return None
          
    #--------------------------------------------------------------------------
    
    def _frames_to_time(self,frames):
-      minutes = frames/(self.fps*60)
-      seconds = (frames%(self.fps*60))/float(self.fps)
+      minutes = frames//(FRAMES_PER_SECOND*60)
+      seconds = (frames%(FRAMES_PER_SECOND*60))/float(FRAMES_PER_SECOND)
       return "%02d:%05.2f" % (minutes,seconds)
          
    #--------------------------------------------------------------------------
@@ -212,15 +273,4 @@ class GameOverState(State,SystemEventListener):
          
       high_score_file.close()
          
-      return high_score  
-      
-   #--------------------------------------------------------------------------
-   
-   def _write_high_score(self,new_high_score,new_best_time):
-   
-      high_score_file = open(HIGH_SCORE_FILE,'w')
-      
-      high_score_file.write(str(new_high_score)+SCORE_DELIMITER+\
-                            str(new_best_time))
-      
-      high_score_file.close()
\ No newline at end of file
+      return high_score
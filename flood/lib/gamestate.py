@@ -6,27 +6,78 @@
 # 12/12 GoshDarnGames
 ##############################################################################
 
+import array
 import pygame
 import math
 import random
+import sys
 
-from engine.abs.gameobject import GameObject
-from engine.abs.state import State
-from engine.abs.events import *
-from engine.systemevents import *
+from .engine.abs.gameobject import GameObject
+from .engine.abs.state import State
+from .engine.abs.events import *
+from .engine.systemevents import *
+from .engine.timing import monotonic
+from .engine.viewport import Viewport
 
-from gameoverstate import GameOverState
+from .gameoverstate import GameOverState, FRAMES_PER_SECOND
+from .boards import random_cells, neighbour_table
+from .scorestore import board_name
+from .snapshot import BoardSnapshot
+from .replay import UNDO, REDO
 
 ##############################################################################
 # CONSTANTS
 ##############################################################################
 
-#number of squares in the puzzle.  Should be a square number that divides
-#into the screen_size without remainder
-NUM_SQUARES = 144
+#size of the board in squares for new games.  Boards that don't fit on the
+#screen can be scrolled and zoomed.
+BOARD_WIDTH = 12
+BOARD_HEIGHT = 12
 
-COLORS = [(255,0,0),(255,255,0),(255,0,255),
-          (0,255,0), (0,0,255), (0,255,255)]
+#colours the squares can be.  Games use the first NUM_COLORS of them.
+PALETTE = [(255,0,0),(255,255,0),(255,0,255),
+           (0,255,0), (0,0,255), (0,255,255),
+           (255,128,0),(128,0,255),(255,255,255),
+           (128,128,128),(0,128,0),(128,64,0)]
+
+NUM_COLORS = 6
+
+COLORS = PALETTE[:NUM_COLORS]
+
+#screen pixels the view scrolls by for each key press
+SCROLL_STEP = 40
+
+#how much each zoom in or out changes the zoom by
+ZOOM_STEP = 2.0
+
+#largest size in screen pixels a square can be zoomed to
+MAX_SQUARE_SIZE = 80
+
+#solver strategy used for hints and autoplay, see solver.STRATEGIES
+HINT_STRATEGY = "beam"
+
+#keys that ask for a hint and turn autoplay on and off
+HINT_KEY = pygame.K_h
+AUTOPLAY_KEY = pygame.K_a
+
+#seconds between the moves made by autoplay
+AUTOPLAY_DELAY = 0.25
+
+#keys that take back the last move and play a move taken back again
+UNDO_KEY = pygame.K_u
+REDO_KEY = pygame.K_r
+
+#store the grid as a numpy array of colour indices instead of a list of
+#colours.  Uses less memory on big grids but requires numpy.
+ARRAY_GRID = False
+
+#record the clicks of every game to the replay archive, see replay.py
+RECORD_REPLAYS = True
+
+#(lowest, highest) par score of the boards new games are started from, or
+#None to generate a new board.  Boards come from the board cache, see
+#boards.py, and a new board is generated if it has none that hard.
+DIFFICULTY = None
 
 ##############################################################################
 # GAME EVENTS
@@ -37,6 +88,8 @@ class SquareClicked(Event):
    Generated by the game event manager when the player clicks on a square.
    """
    
+   __slots__ = ('square_idx',)
+   
    def __init__(self,square_idx):
       """
       square_idx - index of the square clicked
@@ -48,7 +101,49 @@ class GridUpdated(Event):
    Generated by the grid when the user clicks on an edge square and all
    connected squares have been changed.
    """
-   pass
+   __slots__ = ()
+   
+#GridUpdated carries no data so this one instance is always posted
+GRID_UPDATED = GridUpdated()
+
+class UndoMove(Event):
+   """
+   Generated when the player takes back the last move.
+   """
+   __slots__ = ()
+   
+UNDO_MOVE = UndoMove()
+
+class RedoMove(Event):
+   """
+   Generated when the player plays the last move taken back again.
+   """
+   __slots__ = ()
+   
+REDO_MOVE = RedoMove()
+
+class GridUndone(Event):
+   """
+   Generated by the grid when a move has been taken back.  A move played
+   again is announced with GridUpdated like any other.
+   """
+   __slots__ = ()
+   
+GRID_UNDONE = GridUndone()
+
+class HintFound(Event):
+   """
+   Generated when a background search for the best moves finishes.
+   """
+   
+   __slots__ = ('moves',)
+   
+   def __init__(self,moves):
+      """
+      moves - list of colour indices that solve the grid from where it was
+              when the search started, or None if none were found
+      """
+      self.moves = moves
       
 ##############################################################################
 # GAME EVENTS - MANAGER AND LISTENER CLASSES
@@ -66,87 +161,295 @@ class GameEventListener(Listener):
 
 class Grid(GameObject,GameEventListener):
    
-   def __init__(self,game_event_manager,square_size):
+   event_types = (SquareClicked,UndoMove,RedoMove)
+   
+   in_world = True
+   
+   def __init__(self,game_event_manager,square_size,rng=random,cells=None,
+                width=BOARD_WIDTH,height=BOARD_HEIGHT,colors=COLORS):
+      """
+      rng    - random number generator used to colour the squares.  Pass a
+               seeded random.Random to get the same grid every time.
+      cells  - colour indices of a board made earlier, e.g. from the board
+               cache, used instead of colouring the squares from 'rng'
+      width  - number of squares in each row
+      height - number of rows
+      colors - colours the squares can be
+      """
       GameEventListener.__init__(self,game_event_manager)
       
       self.game_event_manager = game_event_manager
       
+      self.width = width
+      self.height = height
+      self.colors = colors
+      
       self.squares = []
-      self._populate_squares()
+      self._populate_squares(rng,cells)
       self.square_size = square_size
       
-      #stores which squares have been visited by the recursive algorithms
-      #for detecting neighbours and such so that they don't recurse infinitely
-      self._visited = []
+      #neighbours of each square, shared by every grid of this shape
+      self._neighbours = neighbour_table(width,height)
+      
+      #the block of squares connected to the top-left is tracked between
+      #clicks so that a click only costs as much as the squares it absorbs.
+      #_owned flags the squares in the block, _region lists them and
+      #_frontier maps each colour to the set of squares of that colour
+      #around the edge of the block.
+      self._owned = None
+      self._region = []
+      self._frontier = {}
+      self._build_region()
+      
+      #each move is kept as the square clicked, the colour the block was
+      #before it and how many squares it absorbed.  The squares absorbed are
+      #the last ones in _region, so nothing else has to be kept to undo it.
+      #_redo holds the squares clicked in the moves undone.
+      self._moves = array.array("i")
+      self._move_colors = bytearray()
+      self._move_sizes = array.array("i")
+      self._redo = array.array("i")
+      
+      #the grid is drawn onto an off-screen surface which is blitted to the
+      #screen.  Only squares that have changed colour since the last draw
+      #are repainted onto it.  The surface is created on the first draw.
+      self._surface = None
+      self._dirty = set()
+      self._drawn = False
       
    #--------------------------------------------------------------------------
       
-   def _populate_squares(self):
+   def _populate_squares(self,rng,cells=None):
    
-      self.squares = []
+      if cells is None:
+         cells = random_cells(rng,self.width*self.height,len(self.colors))
    
-      for i in range(NUM_SQUARES):
-         self.squares.append(random.choice(COLORS))
+      colors = self.colors
+      self.squares = [colors[color_idx] for color_idx in cells]
+      
+      #the colour index of each square is kept alongside its colour so the
+      #board can be handed out as a buffer, see snapshot()
+      self._cells = bytearray(cells)
+      self._color_idx = dict((color, i) for i, color in enumerate(colors))
          
    #--------------------------------------------------------------------------
          
    def render(self,screen):
       
-      for i in range(len(self.squares)):
-         #work out the x/y of the rect in order to place squares in a grid
-         left = self.square_size*(i%int(math.sqrt(NUM_SQUARES)))
-         top = self.square_size*(i/int(math.sqrt(NUM_SQUARES)))
+      self._update_surface(screen)
+      screen.blit(self._surface,(0,0))
+      
+      self._drawn = True
          
-         to_draw = pygame.Rect(left, top,self.square_size,self.square_size)
+   #--------------------------------------------------------------------------
+   
+   def repaint(self,screen,rect):
+      """
+      Draws the squares under 'rect' again, e.g. to rub out something drawn
+      over them.  Returns the rect drawn to.
+      """
+      return screen.blit(self._surface,rect,rect)
+      
+   #--------------------------------------------------------------------------
+   
+   def render_dirty(self,screen):
+      """
+      Draws only the squares that have changed colour since the grid was
+      last drawn.  Returns the rects that were drawn to.
+      """
+      
+      if not self._drawn:
+         self.render(screen)
+         return [screen.get_rect().clip(self._surface.get_rect())]
+      
+      rect = self._update_surface(screen)
+      
+      if rect is None:
+         return []
+      
+      return [screen.blit(self._surface,rect,rect)]
+      
+   #--------------------------------------------------------------------------
+   
+   def _update_surface(self,screen):
+      """
+      Repaints the squares that have changed colour onto the off-screen
+      surface, creating it if needed.  Returns the rect around the squares
+      that were repainted or None if none were.
+      """
+      
+      if self._surface is None:
+         size = int(self.square_size)
+         self._surface = pygame.Surface((self.width*size,self.height*size),
+                                        0,screen)
+         self._dirty = set(range(len(self.squares)))
+      
+      if not self._dirty:
+         return None
          
-         pygame.draw.rect(screen,self.squares[i],to_draw)
+      rects = [self._draw_square(self._surface,i) for i in self._dirty]
+      self._dirty.clear()
+      
+      return rects[0].unionall(rects)
+         
+   #--------------------------------------------------------------------------
+   
+   def _draw_square(self,screen,idx):
+      """
+      Fills in the square at 'idx' and returns the rect it covers.
+      """
+      
+      size = int(self.square_size)
+      
+      #work out the x/y of the rect in order to place squares in a grid
+      left = size*(idx%self.width)
+      top = size*(idx//self.width)
+      
+      return screen.fill(self.squares[idx],(left,top,size,size))
          
    #--------------------------------------------------------------------------
    
    def notify(self,event):
       if isinstance(event,SquareClicked):
+      
+         #a new move can't be followed by the moves undone before it
+         if self._click(event.square_idx):
+            del self._redo[:]
+            
+      if isinstance(event,UndoMove):
+         self._undo()
          
-         #check if the clicked square is a neighbour of top-left block
-         if event.square_idx in self._get_edge_squares():
-         
-            #change all attached blocks to the clicked colour
-            for attached_idx in self._get_attached():
-               self.squares[attached_idx] = self.squares[event.square_idx]
-               
-            self.game_event_manager.post(GridUpdated())
+      if isinstance(event,RedoMove):
+         if self._redo:
+            self._click(self._redo.pop())
          
    #--------------------------------------------------------------------------
    
-   def _get_attached(self):
+   def _click(self,square_idx):
       """
-      Returns a list of squares attached to the top-left square.
+      Plays the move of clicking on 'square_idx'.  Returns True if the
+      square was around the edge of the block.
       """
       
-      self._visited = []
+      if not 0 <= square_idx < len(self.squares):
+         return False
+      
+      color = self.squares[square_idx]
+      
+      #check if the clicked square is a neighbour of top-left block
+      if square_idx not in self._frontier.get(color,()):
+         return False
+         
+      self._moves.append(square_idx)
+      self._move_colors.append(self._cells[0])
+      
+      #change all attached blocks to the clicked colour
+      color_idx = self._color_idx[color]
+      
+      for attached_idx in self._region:
+         self.squares[attached_idx] = color
+         self._cells[attached_idx] = color_idx
+         
+      self._dirty.update(self._region)
+         
+      #then grow the block into the squares of that colour
+      absorbed = self._absorb(self._frontier.pop(color))
+      self._move_sizes.append(len(absorbed))
+         
+      self.game_event_manager.post(GRID_UPDATED)
       
-      return self._recurse_attached(0)
+      return True
       
    #--------------------------------------------------------------------------
+   
+   def _undo(self):
+      """
+      Takes back the last move.  Only the squares in the block are changed
+      and looked at.
+      """
       
-   def _recurse_attached(self,idx):
+      if not self._moves:
+         return
+         
+      self._redo.append(self._moves.pop())
+      color_idx = self._move_colors.pop()
+      size = self._move_sizes.pop()
+      
+      #the squares absorbed go back to being the colour they were clicked
+      #as, which they still are
+      region = self._region
+      owned = self._owned
+      
+      for idx in region[len(region)-size:]:
+         owned[idx] = 0
+      
+      del region[len(region)-size:]
+      
+      color = self.colors[color_idx]
+      
+      for idx in region:
+         self.squares[idx] = color
+         self._cells[idx] = color_idx
+         
+      self._dirty.update(region)
+      
+      #the squares around what is left of the block
+      squares = self.squares
+      neighbours = self._neighbours
+      frontier = self._frontier = {}
+      
+      for idx in region:
+         for n in neighbours[idx*4:idx*4+4]:
+            if n != -1 and not owned[n]:
+               frontier.setdefault(squares[n],set()).add(n)
+               
+      self.game_event_manager.post(GRID_UNDONE)
+      
+   #--------------------------------------------------------------------------
+   
+   def is_filled(self):
       """
-      Traverses all squares attached to 'idx' and returns a list of squares
-      connected to it.
+      Returns True when every square is the same colour.
       """
+      return len(self._region) == len(self.squares)
+      
+   #--------------------------------------------------------------------------
    
-      self._visited.append(idx)
+   def snapshot(self):
+      """
+      Returns a BoardSnapshot viewing the colour index of every square.
+      Nothing is copied, so it changes as the grid does.
+      """
+      return BoardSnapshot(memoryview(self._cells),self.width,self.height,
+                           len(self.colors))
+      
+   #--------------------------------------------------------------------------
    
-      attached = [idx]
+   def memory_usage(self):
+      """
+      Returns roughly how many bytes the grid's squares and region take up,
+      not counting the colours, which are shared, or the drawing surface.
+      """
       
-      for n in self._get_neighbours(idx):
+      size = sys.getsizeof(self.squares)+sys.getsizeof(self._owned)+\
+             sys.getsizeof(self._region)+sys.getsizeof(self._frontier)+\
+             sys.getsizeof(self._dirty)+sys.getsizeof(self._cells)+\
+             sys.getsizeof(self._moves)+sys.getsizeof(self._move_colors)+\
+             sys.getsizeof(self._move_sizes)+sys.getsizeof(self._redo)
+             
+      for squares in self._frontier.values():
+         size += sys.getsizeof(squares)
+         
+      return size
       
-         if n in self._visited:
-            continue
-            
-         if self.squares[n] == self.squares[idx]:
-            attached+= self._recurse_attached(n)
-            
-      return attached
+   #--------------------------------------------------------------------------
+   
+   def _get_attached(self):
+      """
+      Returns a list of squares attached to the top-left square.
+      """
+      
+      return list(self._region)
    
    #--------------------------------------------------------------------------
    
@@ -156,37 +459,72 @@ class Grid(GameObject,GameEventListener):
       to the top-left corner.
       """
       
-      #cells already visited
-      self._visited = []
+      edge_squares = []
       
-      #list of neighbours to be returned
-      return self._recurse_edge_squares(0)
+      for squares in self._frontier.values():
+         edge_squares.extend(squares)
+         
+      return edge_squares
       
    #--------------------------------------------------------------------------
    
-   def _recurse_edge_squares(self,idx):
+   def _build_region(self):
       """
-      Used to traverse all squares connected to 'idx' and return a list of
-      squares around the edge of that block.
+      Works out the block of squares connected to the top-left corner from
+      scratch.
       """
       
-      self._visited.append(idx)
+      self._owned = bytearray(len(self.squares))
+      self._region = []
+      self._frontier = {}
       
-      neighbours = self._get_neighbours(idx)
+      self._absorb([0])
       
-      edge_squares = []
+   #--------------------------------------------------------------------------
+   
+   def _absorb(self,start):
+      """
+      Adds the squares in 'start', which must all be the same colour, and 
+      every square of that colour connected to them to the block.  The 
+      frontier is extended with the squares found around the new part of the
+      block.  Returns a list of the squares absorbed.
       
-      for n in neighbours:
+      Uses an explicit stack rather than recursion so large grids don't hit
+      the recursion limit.
+      """
       
-         if n in self._visited:
-            continue
+      squares = self.squares
+      owned = self._owned
+      frontier = self._frontier
+      neighbours = self._neighbours
       
-         if(self.squares[n] == self.squares[idx]):
-            edge_squares += self._recurse_edge_squares(n) 
-         else:
-            edge_squares.append(n)
-            
-      return edge_squares          
+      stack = list(start)
+      
+      for idx in stack:
+         owned[idx] = 1
+      
+      absorbed = []
+      
+      while stack:
+         idx = stack.pop()
+         absorbed.append(idx)
+         
+         color = squares[idx]
+         
+         for n in neighbours[idx*4:idx*4+4]:
+         
+            if n == -1 or owned[n]:
+               continue
+               
+            if squares[n] == color:
+               owned[n] = 1
+               stack.append(n)
+            else:
+               frontier.setdefault(squares[n],set()).add(n)
+               
+      self._region.extend(absorbed)
+      
+      return absorbed
       
    #--------------------------------------------------------------------------
       
@@ -195,28 +533,31 @@ class Grid(GameObject,GameEventListener):
       Returns a list of squares that are next to a given block.
       """
       
-      neighbours = []
-      
-      #east
-      if (idx+1)%int(math.sqrt(NUM_SQUARES)) is not 0:
-         neighbours.append(idx+1)
-      
-      #west
-      if (idx-1)%int(math.sqrt(NUM_SQUARES)) is not \
-                                             int(math.sqrt(NUM_SQUARES))-1:
-         neighbours.append(idx-1)
-      
-      #north
-      if idx-int(math.sqrt(NUM_SQUARES)) in range(len(self.squares)):
-         neighbours.append(idx-int(math.sqrt(NUM_SQUARES)))
-      
-      #south
-      if idx+int(math.sqrt(NUM_SQUARES)) in range(len(self.squares)):
-         neighbours.append(idx+int(math.sqrt(NUM_SQUARES)))
-      
-      return neighbours
-         
-      
+      return [n for n in self._neighbours[idx*4:idx*4+4] if n != -1]
+
+##############################################################################
+# GRID CREATION
+##############################################################################
+
+def create_grid(game_event_manager,square_size,rng=random,array_grid=None,
+                cells=None,width=BOARD_WIDTH,height=BOARD_HEIGHT,
+                colors=COLORS):
+   """
+   Creates the kind of grid selected by ARRAY_GRID (or 'array_grid' if it is
+   given) registered with 'game_event_manager'.  Both kinds make the same
+   board from the same 'rng', and never make a board of one colour.
+   'cells' gives the colour indices of a board made earlier instead.
+   """
+   
+   if array_grid is None:
+      array_grid = ARRAY_GRID
+   
+   if array_grid:
+      from .arraygrid import ArrayGrid
+      return ArrayGrid(game_event_manager,int(square_size),width,height,
+                       colors,rng,cells)
+   
+   return Grid(game_event_manager,square_size,rng,cells,width,height,colors)
 
 ##############################################################################
 # GAME STATE CLASS
@@ -224,74 +565,418 @@ class Grid(GameObject,GameEventListener):
 
 class GameState(State,SystemEventListener,GameEventListener):
 
-   def __init__(self,model,fps):
+   #only registered with the game event manager.  System events are passed
+   #on by the model.
+   event_types = (GridUpdated,GridUndone,HintFound)
+   
+   #mouse motion is only wanted while the view is dragged, so the rest of
+   #the time it is left in pygame.  Quitting ends the game however it
+   #happens.
+   system_event_types = (KeyboardEvent,MouseButtonEvent,QuitEvent)
+   drag_event_types = system_event_types+(MouseMotionEvent,)
+
+   def __init__(self,model,fps,width=BOARD_WIDTH,height=BOARD_HEIGHT,
+                num_colors=NUM_COLORS):
+      """
+      width      - number of squares in each row of the board
+      height     - number of rows
+      num_colors - number of colours from PALETTE the squares can be
+      """
       State.__init__(self,model)
       
-      #create game event manager and register self as listener
-      self.game_event_manager = GameEventManager()
+      #create game event manager and register self as listener.  It queues
+      #events if the system event manager does.
+      self.game_event_manager = \
+                     GameEventManager(self.model.system_event_manager.queued)
       GameEventListener.__init__(self,self.game_event_manager)
       
       self.screen_size = self.model.screen_size
       
       self.fps = fps
-      self.frames_elapsed = 0
       
-      #set the square_size so all squares will fit in the playing field
-      self.square_size = self.screen_size[0]/math.sqrt(NUM_SQUARES)
-      self.grid = Grid(self.game_event_manager,self.square_size)
+      #the time taken is measured with a clock rather than by counting
+      #frames, so a slow frame rate doesn't slow the timer down
+      self.start_time = monotonic()
+      
+      #passed on to the next game so it is played on the same kind of board
+      self.game_options = {"width": width, "height": height,
+                           "num_colors": num_colors}
+      
+      colors = PALETTE[:num_colors]
       
-      #check for the highly unlikely situation where all squares are the
-      #same      
-      while(self._check_win()):
-         self.grid = Grid(self.game_event_manager,self.square_size)   
+      #the squares are drawn as big as will let the whole board fit on the
+      #screen, but at least one pixel.  Boards too big for that are zoomed
+      #out to fit and can be zoomed in.
+      self.square_size = max(1,min(self.screen_size[0]//width,
+                                   self.screen_size[1]//height))
+      
+      #each board comes from its own seed so scores can be kept per board
+      self.seed = random.getrandbits(32)
+      cells = None
+      
+      if DIFFICULTY is not None:
+         from .boards import get_board_cache
+         board = get_board_cache(width,height,num_colors).pick(*DIFFICULTY)
+         
+         if board is not None:
+            self.seed = board.seed
+            cells = board.cells
+      
+      self.grid = create_grid(self.game_event_manager,self.square_size,
+                              random.Random(self.seed),cells=cells,
+                              width=width,height=height,colors=colors)
       
       self.game_objects.append(self.grid)
       
+      self.viewport = Viewport((width*self.square_size,
+                                height*self.square_size),
+                               ((0,0),self.screen_size),
+                               float(MAX_SQUARE_SIZE)/self.square_size)
+      
+      #mouse position the view was last dragged to, or None when it isn't
+      #being dragged.  Queued motion events coalesce so the drag follows
+      #the position rather than adding up each event's movement.
+      self.drag_pos = None
+      
       self.click_count = 0    
       
+      #hints are searched for in the background by a HintSearcher, created
+      #the first time one is asked for.  'hint_moves' are the moves found
+      #that haven't been played yet.
+      self.hint_searcher = None
+      self.hint_marker = None
+      self.hint_moves = None
+      self.autoplay = False
+      self.next_autoplay_time = 0.0
+      
+      self.replay_recorder = None
+      
+      if RECORD_REPLAYS:
+         from .replay import ReplayRecorder
+         self.replay_recorder = ReplayRecorder(self.seed,width,height,
+                                               colors,ARRAY_GRID,
+                                               self._frames_elapsed)
+      
    #--------------------------------------------------------------------------
    
    def notify(self,event):
+      if isinstance(event,QuitEvent):
+         self._end_game()
+         
       if isinstance(event,KeyboardEvent):
          if event.key == pygame.K_ESCAPE:
-            self.model.system_event_manager.post(QuitEvent())
+            self.model.system_event_manager.post(QUIT_EVENT)
+            
+         if event.type == pygame.KEYDOWN:
+            self._move_view(event.key)
+            
+            if event.key == HINT_KEY:
+               self._request_hint()
+               
+            if event.key == AUTOPLAY_KEY:
+               self.autoplay = not self.autoplay
+               
+               if self.autoplay:
+                  self._request_hint()
+                  
+            if event.key == UNDO_KEY:
+               self._take_back(UNDO,UNDO_MOVE)
+               
+            if event.key == REDO_KEY:
+               self._take_back(REDO,REDO_MOVE)
+               
+      if isinstance(event,TickEvent):
+         if self.hint_searcher is not None:
+            self.hint_searcher.poll()
+            self.game_event_manager.drain()
+            
+         if self.autoplay and self.hint_moves and \
+            monotonic() >= self.next_autoplay_time:
+            self._autoplay_move()
+            
+      if isinstance(event,MouseMotionEvent):
+         #drag the view around with the right mouse button
+         if event.buttons[2] and self.drag_pos is not None:
+            self.viewport.scroll(self.drag_pos[0]-event.pos[0],
+                                 self.drag_pos[1]-event.pos[1])
+            self.drag_pos = event.pos
             
       if isinstance(event,MouseButtonEvent):
+         if event.button == 3:
+            if event.type == pygame.MOUSEBUTTONDOWN:
+               self._set_dragging(event.pos)
+            else:
+               self._set_dragging(None)
+            
+         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 4:
+            self.viewport.zoom_at(ZOOM_STEP,event.pos)
+            
+         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 5:
+            self.viewport.zoom_at(1/ZOOM_STEP,event.pos)
+            
          if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            self.game_event_manager.post(
-                              SquareClicked(self._pos_to_grid_idx(event.pos)))
+            square_idx = self._pos_to_grid_idx(event.pos)
+            
+            #clicked outside the board
+            if square_idx is None:
+               return
+            
+            #the player has taken over, so stop thinking about hints
+            self._cancel_hint()
+            self.autoplay = False
+            
+            self._click(square_idx)
                               
+      if isinstance(event,HintFound):
+         self.hint_moves = event.moves
+         
+         if not self.hint_moves:
+            self.hint_moves = None
+            self.hint_marker.hide()
+            self.autoplay = False
+         elif self.autoplay:
+            self.next_autoplay_time = monotonic()
+         else:
+            self._show_hint()
+            
+      if isinstance(event,GridUndone):
+         self.click_count -= 1
+         
       if isinstance(event,GridUpdated):
          self.click_count += 1
          
          if self._check_win():
-            self.model.change_state(GameOverState(self.model,
-                                                  self.click_count,
-                                                  self.fps,
-                                                  self.frames_elapsed))
-                                                  
-      if isinstance(event,TickEvent):
-         self.frames_elapsed+=1
+            self._end_game()
+            board = board_name(self.grid.width,self.grid.height)
+            self.model.start_state(GameOverState,self.click_count,self.fps,
+                                   self._frames_elapsed(),board,self.seed,
+                                   self.game_options)
             
    #--------------------------------------------------------------------------
    
+   def wake_time(self):
+      """
+      The board only changes on input, except while a hint is being
+      searched for, which is checked on every tick, and between the moves
+      made by autoplay.  The time taken comes from the clock so it is right
+      however few ticks there are.
+      """
+      
+      if self.hint_searcher is not None and \
+         self.hint_searcher.is_searching():
+         return 0.0
+         
+      if self.autoplay and self.hint_moves:
+         return self.next_autoplay_time
+         
+      return None
+      
+   #--------------------------------------------------------------------------
+   
+   def _frames_elapsed(self):
+      """
+      Returns the time since the game started as a number of frames at 
+      FRAMES_PER_SECOND, which is how GameOverState records times.
+      """
+      return int(round((monotonic()-self.start_time)*FRAMES_PER_SECOND))
+      
+   #--------------------------------------------------------------------------
+   
+   def _click(self,square_idx):
+      """
+      Clicks on a square for the player or autoplay.
+      """
+      
+      if self.replay_recorder is not None:
+         self.replay_recorder.record(square_idx)
+         
+      self.game_event_manager.post(SquareClicked(square_idx))
+      self.game_event_manager.drain()
+      
+   #--------------------------------------------------------------------------
+   
+   def _take_back(self,square_idx,event):
+      """
+      Undoes or redoes a move.  'square_idx' is the replay.UNDO or
+      replay.REDO the replay records in place of a square.
+      """
+      
+      #the hint was for the board as it is now
+      self._cancel_hint()
+      self.autoplay = False
+      
+      if self.replay_recorder is not None:
+         self.replay_recorder.record(square_idx)
+         
+      self.game_event_manager.post(event)
+      self.game_event_manager.drain()
+      
+   #--------------------------------------------------------------------------
+   
+   def _request_hint(self):
+      """
+      Starts searching for the best moves in the background, unless moves
+      have already been found or are being searched for.
+      """
+      
+      if self.hint_moves:
+         if not self.autoplay:
+            self._show_hint()
+         return
+      
+      if self.hint_searcher is None:
+         from .hints import HintSearcher, HintMarker
+         self.hint_searcher = HintSearcher(self.game_event_manager,
+                                           HINT_STRATEGY)
+         self.hint_marker = HintMarker(self.grid)
+         self.game_objects.append(self.hint_marker)
+         
+      if not self.hint_searcher.is_searching():
+         self.hint_searcher.start(self.grid)
+      
+   #--------------------------------------------------------------------------
+   
+   def _show_hint(self):
+      """
+      Outlines a square that makes the next of the moves found.
+      """
+      
+      from .solver import edge_square_for_color
+      
+      self.hint_marker.show(edge_square_for_color(self.grid,
+                                                  self.hint_moves[0]))
+      
+   #--------------------------------------------------------------------------
+   
+   def _cancel_hint(self):
+      """
+      Forgets the moves found and stops any search, as they are no use once
+      the player has made a move of their own.
+      """
+      
+      if self.hint_searcher is None:
+         return
+      
+      self.hint_searcher.cancel()
+      self.hint_marker.hide()
+      self.hint_moves = None
+      
+   #--------------------------------------------------------------------------
+   
+   def _autoplay_move(self):
+      """
+      Plays the next of the moves found.
+      """
+      
+      from .solver import edge_square_for_color
+      
+      self.hint_marker.hide()
+      
+      square_idx = edge_square_for_color(self.grid,self.hint_moves.pop(0))
+      self.next_autoplay_time = monotonic()+AUTOPLAY_DELAY
+      
+      #the moves don't fit the grid any more, so look again
+      if square_idx is None:
+         self.hint_moves = None
+         self._request_hint()
+         return
+         
+      self._click(square_idx)
+      
+   #--------------------------------------------------------------------------
+   
+   def _end_game(self):
+      """
+      Saves the replay and shuts down the hint search.
+      """
+      
+      self._save_replay()
+      
+      if self.hint_searcher is not None:
+         self.hint_searcher.close()
+      
+   #--------------------------------------------------------------------------
+   
+   def _save_replay(self):
+      """
+      Writes the game's clicks to the replay archive.
+      """
+      
+      if self.replay_recorder is None:
+         return
+      
+      from .replay import get_replay_writer
+      
+      replay_writer = get_replay_writer()
+      replay_writer.write(self.replay_recorder.replay)
+      replay_writer.flush()
+      
+      self.replay_recorder = None
+      
+   #--------------------------------------------------------------------------
+   
+   def _set_dragging(self,pos):
+      """
+      Starts listening for mouse motion to drag the view with from 'pos',
+      or stops if 'pos' is None.
+      """
+      
+      self.drag_pos = pos
+      
+      if pos is not None:
+         self.system_event_types = self.drag_event_types
+      else:
+         self.system_event_types = GameState.system_event_types
+         
+      self.model.update_event_types()
+      
+   #--------------------------------------------------------------------------
+   
+   def _move_view(self,key):
+      """
+      Scrolls the view with the arrow keys and zooms it with plus and minus.
+      """
+      
+      if key == pygame.K_LEFT:
+         self.viewport.scroll(-SCROLL_STEP,0)
+      elif key == pygame.K_RIGHT:
+         self.viewport.scroll(SCROLL_STEP,0)
+      elif key == pygame.K_UP:
+         self.viewport.scroll(0,-SCROLL_STEP)
+      elif key == pygame.K_DOWN:
+         self.viewport.scroll(0,SCROLL_STEP)
+      elif key in (pygame.K_EQUALS,pygame.K_PLUS,pygame.K_KP_PLUS):
+         self.viewport.zoom_at(ZOOM_STEP)
+      elif key in (pygame.K_MINUS,pygame.K_KP_MINUS):
+         self.viewport.zoom_at(1/ZOOM_STEP)
+      
+   #--------------------------------------------------------------------------
+   
    def _pos_to_grid_idx(self,pos):
       """
       For some reason I decided it would be a great idea to store the squares
       in a 1 dimensional array instead of a 2d array... here is the function
-      to convert screen (x,y) into a list index for the grid.
+      to convert screen (x,y) into a list index for the grid.  Returns None
+      if 'pos' isn't over the board.
       """
-      x = int(math.floor(pos[0]/self.square_size))
-      y = int(math.floor(pos[1]/self.square_size))
-      return x+(y*int(math.sqrt(NUM_SQUARES)))
+      
+      world_pos = self.viewport.to_world(pos)
+      
+      if world_pos is None:
+         return None
+      
+      x = int(math.floor(world_pos[0]/self.square_size))
+      y = int(math.floor(world_pos[1]/self.square_size))
+      return x+(y*self.grid.width)
       
    #--------------------------------------------------------------------------
    
    def _check_win(self):
       """
-      Here's when my 1d array design finally pays off!
+      The grid keeps track of the block connected to the top-left so it
+      already knows whether it covers everything.
       """
-      return len(set(self.grid.squares)) is 1
+      return self.grid.is_filled()
                
                
    
@@ -0,0 +1,217 @@
+##############################################################################
+# hints.py
+##############################################################################
+# Searches for the best moves in a worker process so the game keeps running
+# while it thinks, and marks the next move on the grid.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import multiprocessing
+import signal
+import pygame
+
+from .engine.abs.gameobject import GameObject
+from .gamestate import HintFound
+from .solver import solve
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+HINT_COLOR = (255,255,255)
+
+##############################################################################
+# SEARCH
+##############################################################################
+
+def _init_worker():
+   """
+   Workers may start with the handler pygame puts on SIGTERM, which would
+   stop cancel() from killing them.
+   """
+   signal.signal(signal.SIGTERM,signal.SIG_DFL)
+
+#-----------------------------------------------------------------------------
+
+def find_moves(args):
+   """
+   Solves a snapshot of a grid.  'args' is a (BoardSnapshot, strategy)
+   tuple and the result is a list of colour indices.  Runs in a worker
+   process.
+   """
+
+   snapshot, strategy = args
+
+   return solve(snapshot.to_board(),strategy)
+
+#-----------------------------------------------------------------------------
+
+class HintSearcher:
+   """
+   Runs one search at a time in a worker process.  A snapshot of the grid
+   is copied when a search starts, so the grid can change while
+   the worker searches.
+
+   The worker can't post to the game event manager itself, so poll() is
+   called on each tick and posts a HintFound once the search has finished.
+   Cancelling a search stops the worker straight away and a new one is
+   started with the next search.
+   """
+
+   def __init__(self,game_event_manager,strategy="beam"):
+      self.game_event_manager = game_event_manager
+      self.strategy = strategy
+
+      self.pool = None
+      self.result = None
+
+   #--------------------------------------------------------------------------
+
+   def start(self,grid):
+      """
+      Starts searching for moves that solve 'grid' as it is now, cancelling
+      any search already running.
+      """
+
+      self.cancel()
+
+      if self.pool is None:
+         self.pool = multiprocessing.Pool(1,_init_worker)
+
+      #copied now as the task is sent to the worker later
+      args = (grid.snapshot().copy(),self.strategy)
+
+      self.result = self.pool.apply_async(find_moves,(args,))
+
+   #--------------------------------------------------------------------------
+
+   def is_searching(self):
+      return self.result is not None
+
+   #--------------------------------------------------------------------------
+
+   def poll(self):
+      """
+      Posts a HintFound if the search has finished.  Its moves are None if
+      the search gave up or failed.
+      """
+
+      if self.result is None or not self.result.ready():
+         return
+
+      #an error in the worker is raised again by get().  No hint is better
+      #than taking the game down with it.
+      try:
+         moves = self.result.get()
+      except Exception:
+         moves = None
+
+      self.result = None
+
+      self.game_event_manager.post(HintFound(moves))
+
+   #--------------------------------------------------------------------------
+
+   def cancel(self):
+      """
+      Stops the search if one is running.
+      """
+
+      if self.result is None:
+         return
+
+      self.result = None
+
+      #the only way to stop a worker part way through a search
+      self.pool.terminate()
+      self.pool = None
+
+   #--------------------------------------------------------------------------
+
+   def close(self):
+      """
+      Stops any search and shuts the worker down.
+      """
+
+      self.cancel()
+
+      if self.pool is not None:
+         self.pool.close()
+         self.pool = None
+
+##############################################################################
+# GAME OBJECT - HINT MARKER
+##############################################################################
+
+class HintMarker(GameObject):
+   """
+   Outlines the square to click next.  Drawn on top of the grid, which
+   repaints the squares under the outline when it moves.
+   """
+
+   in_world = True
+
+   def __init__(self,grid):
+      self.grid = grid
+
+      #square outlined, or None
+      self.square_idx = None
+
+      #rect outlined on the surface last drawn to and whether it has to be
+      #drawn again
+      self.drawn_rect = None
+      self.changed = False
+
+   #--------------------------------------------------------------------------
+
+   def show(self,square_idx):
+      if square_idx != self.square_idx:
+         self.square_idx = square_idx
+         self.changed = True
+
+   #--------------------------------------------------------------------------
+
+   def hide(self):
+      self.show(None)
+
+   #--------------------------------------------------------------------------
+
+   def render(self,screen):
+
+      self.drawn_rect = None
+      self.changed = False
+
+      if self.square_idx is None:
+         return
+
+      size = int(self.grid.square_size)
+      y, x = divmod(self.square_idx,self.grid.width)
+
+      rect = pygame.Rect(x*size,y*size,size,size)
+      pygame.draw.rect(screen,HINT_COLOR,rect,max(1,size//10))
+
+      self.drawn_rect = rect
+
+   #--------------------------------------------------------------------------
+
+   def render_dirty(self,screen):
+      """
+      Rubs out the old outline and draws the new one if the square has
+      changed.  Returns the rects drawn to.
+      """
+
+      if not self.changed:
+         return []
+
+      rects = []
+
+      if self.drawn_rect is not None:
+         rects.append(self.grid.repaint(screen,self.drawn_rect))
+
+      self.render(screen)
+
+      if self.drawn_rect is not None:
+         rects.append(self.drawn_rect)
+
+      return rects
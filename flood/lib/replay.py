@@ -0,0 +1,312 @@
+##############################################################################
+# replay.py
+##############################################################################
+# Records the clicks of every game to an append-only binary archive so games
+# can be audited and replayed later without storing the boards themselves.
+# A board is rebuilt from its seed.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import array
+import mmap
+import os
+import struct
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+REPLAY_FILE = os.path.join("data","replays.bin")
+
+#bytes of replays held in memory before they are written to the archive
+BUFFER_SIZE = 1 << 16
+
+#each replay is a header, then 3 bytes per palette colour, then a
+#(tick, square_idx) pair for every click.  The header is the magic number,
+#format version, flags, width, height, number of colours, seed and number of
+#clicks.
+MAGIC = b"FLRP"
+
+#version 2 boards are made by boards.random_cells, so version 1 replays are
+#read but can't be simulated.  Version 3 replays may hold UNDO and REDO.
+VERSION = 3
+OLDEST_SIMULATED_VERSION = 2
+HEADER = struct.Struct("<4sBBHHBQI")
+CLICK = struct.Struct("<II")
+
+#header flags
+SEEDED = 1
+ARRAY_GRID = 2
+
+#recorded in place of the square clicked when a move is undone or redone
+UNDO = 0xffffffff
+REDO = 0xfffffffe
+
+##############################################################################
+# REPLAY
+##############################################################################
+
+class Replay:
+   """
+   One recorded game.
+   """
+
+   def __init__(self,seed,width,height,palette,clicks,array_grid=False,
+                version=VERSION):
+      """
+      seed       - seed the board was generated from, or None if it wasn't
+                   seeded, in which case the game can't be re-simulated
+      width      - width of the board in squares
+      height     - height of the board in squares
+      palette    - list of the (r, g, b) colours the board used
+      clicks     - list of (tick, square_idx) for every square clicked,
+                   with UNDO or REDO as the square for undos and redos
+      array_grid - True if the game was played on an ArrayGrid
+      version    - format version the replay was recorded in
+      """
+
+      self.seed = seed
+      self.width = width
+      self.height = height
+      self.palette = palette
+      self.clicks = clicks
+      self.array_grid = array_grid
+      self.version = version
+
+   #--------------------------------------------------------------------------
+
+   def pack(self):
+      """
+      Returns the replay in the archive's binary format.
+      """
+
+      flags = 0
+      seed = 0
+
+      if self.seed is not None:
+         flags |= SEEDED
+         seed = self.seed
+
+      if self.array_grid:
+         flags |= ARRAY_GRID
+
+      data = [HEADER.pack(MAGIC,VERSION,flags,self.width,self.height,
+                          len(self.palette),seed,len(self.clicks))]
+
+      for color in self.palette:
+         data.append(struct.pack("<3B",*color))
+
+      for tick, square_idx in self.clicks:
+         data.append(CLICK.pack(tick,square_idx))
+
+      return b"".join(data)
+
+   #--------------------------------------------------------------------------
+
+   def simulate(self):
+      """
+      Rebuilds the board from the seed and plays the clicks on it through
+      the normal grid rules.  Returns the finished HeadlessGame.
+      """
+
+      from .simulation import HeadlessGame
+
+      if self.seed is None:
+         raise ValueError("Replay of an unseeded game can't be simulated")
+
+      if self.version < OLDEST_SIMULATED_VERSION:
+         raise ValueError("Replay version %d boards were made differently "
+                          "and can't be simulated" % self.version)
+
+      game = HeadlessGame(self.seed,self.array_grid,self.width,self.height,
+                          len(self.palette))
+
+      for tick, square_idx in self.clicks:
+         game.play_move(square_idx)
+
+      return game
+
+##############################################################################
+# RECORDER
+##############################################################################
+
+class ReplayRecorder:
+   """
+   Records every square clicked in a game.  record() is called with each
+   square as the SquareClicked event for it is posted, before the grid has
+   seen it, so the winning click is recorded before the game ends.
+   """
+
+   def __init__(self,seed,width,height,palette,array_grid=False,
+                get_tick=None):
+      """
+      get_tick - function returning the current tick, e.g. frames since the
+                 game started.  Defaults to the number of clicks so far.
+      """
+
+      self.replay = Replay(seed,width,height,list(palette),[],array_grid)
+      self.get_tick = get_tick
+
+   #--------------------------------------------------------------------------
+
+   def record(self,square_idx):
+
+      if self.get_tick is None:
+         tick = len(self.replay.clicks)
+      else:
+         tick = self.get_tick()
+
+      self.replay.clicks.append((tick,square_idx))
+
+##############################################################################
+# WRITER
+##############################################################################
+
+class ReplayWriter:
+   """
+   Appends replays to an archive.  Replays are held in memory until
+   BUFFER_SIZE bytes have built up or flush() is called, so recording many
+   games costs few writes.
+   """
+
+   def __init__(self,path=REPLAY_FILE):
+      self.path = path
+      self.buffer = []
+      self.buffered = 0
+
+   #--------------------------------------------------------------------------
+
+   def write(self,replay):
+      data = replay.pack()
+
+      self.buffer.append(data)
+      self.buffered += len(data)
+
+      if self.buffered >= BUFFER_SIZE:
+         self.flush()
+
+   #--------------------------------------------------------------------------
+
+   def flush(self):
+      """
+      Appends every buffered replay to the archive in one write.
+      """
+
+      if not self.buffer:
+         return
+
+      archive = open(self.path,"ab")
+      archive.write(b"".join(self.buffer))
+      archive.close()
+
+      self.buffer = []
+      self.buffered = 0
+
+##############################################################################
+# READER
+##############################################################################
+
+class ReplayReader:
+   """
+   Reads replays from an archive by index.  The archive is memory-mapped so
+   only the replays read are loaded.  The offset of every replay is found
+   when the reader is opened by hopping from header to header.
+   """
+
+   def __init__(self,path=REPLAY_FILE):
+      self.archive = open(path,"rb")
+      self.data = None
+
+      #offset of each replay in the archive
+      self.offsets = array.array("L")
+
+      size = os.fstat(self.archive.fileno()).st_size
+
+      if size == 0:
+         return
+
+      self.data = mmap.mmap(self.archive.fileno(),0,access=mmap.ACCESS_READ)
+
+      offset = 0
+
+      #a replay still being written at the end of the archive is ignored
+      while offset+HEADER.size <= size:
+         header = HEADER.unpack_from(self.data,offset)
+
+         if header[0] != MAGIC:
+            raise ValueError("Bad replay at offset %d" % offset)
+
+         #later versions may not be laid out the same, so nothing after
+         #one can be found either
+         if header[1] > VERSION:
+            raise ValueError("Replay at offset %d is version %d, newer than "
+                             "version %d this reader understands" %
+                             (offset,header[1],VERSION))
+
+         end = offset+HEADER.size+header[5]*3+header[7]*CLICK.size
+
+         if end > size:
+            break
+
+         self.offsets.append(offset)
+         offset = end
+
+   #--------------------------------------------------------------------------
+
+   def __len__(self):
+      return len(self.offsets)
+
+   #--------------------------------------------------------------------------
+
+   def __getitem__(self,idx):
+      offset = self.offsets[idx]
+
+      magic, version, flags, width, height, num_colors, seed, num_clicks = \
+                                         HEADER.unpack_from(self.data,offset)
+      offset += HEADER.size
+
+      palette = []
+
+      for i in range(num_colors):
+         palette.append(struct.unpack_from("<3B",self.data,offset))
+         offset += 3
+
+      values = struct.unpack_from("<%dI" % (num_clicks*2),self.data,offset)
+      clicks = list(zip(values[0::2],values[1::2]))
+
+      if not flags & SEEDED:
+         seed = None
+
+      return Replay(seed,width,height,palette,clicks,
+                    bool(flags & ARRAY_GRID),version)
+
+   #--------------------------------------------------------------------------
+
+   def __iter__(self):
+      for idx in range(len(self)):
+         yield self[idx]
+
+   #--------------------------------------------------------------------------
+
+   def close(self):
+      if self.data is not None:
+         self.data.close()
+      self.archive.close()
+
+##############################################################################
+# SHARED WRITERS
+##############################################################################
+
+#path -> ReplayWriter, so every game in a process shares one buffer
+_writers = {}
+
+def get_replay_writer(path=REPLAY_FILE):
+   """
+   Returns the ReplayWriter for 'path', creating it the first time.
+   """
+
+   if path not in _writers:
+      _writers[path] = ReplayWriter(path)
+
+   return _writers[path]
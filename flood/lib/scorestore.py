@@ -0,0 +1,376 @@
+##############################################################################
+# scorestore.py
+##############################################################################
+# Keeps every finished game's score in an append-only log that any number of
+# game processes can share.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import os
+
+from .engine.files import replace_file
+
+try:
+   import fcntl
+except ImportError:
+   fcntl = None
+
+try:
+   import msvcrt
+except ImportError:
+   msvcrt = None
+
+##############################################################################
+# CONSTANTS
+##############################################################################
+
+SCORE_LOG_FILE = os.path.join("data","scores.log")
+
+#character used to split the fields of a score
+SCORE_DELIMITER = ":"
+
+#written in place of the seed for games that weren't seeded
+NO_SEED = "-"
+
+#the log is compacted when it holds more than this many scores
+COMPACT_AFTER = 4096
+
+#scores kept by compaction for each board size and for each of the
+#KEEP_SEEDS seeds played most recently.  Every other seed keeps its best.
+KEEP_PER_BOARD = 100
+KEEP_PER_SEED = 10
+KEEP_SEEDS = 256
+
+##############################################################################
+# FILE LOCK
+##############################################################################
+
+class FileLock:
+   """
+   Lock held on a file next to the score log while it is read or written.
+   Uses flock on unix and msvcrt.locking on windows.  Windows has no shared
+   locks so readers lock exclusively there.  Where neither is available the
+   lock does nothing.
+   """
+
+   def __init__(self,path):
+      self.path = path
+      self.lock_file = None
+
+   #--------------------------------------------------------------------------
+
+   def acquire(self,exclusive=True):
+      self.lock_file = open(self.path,"a+")
+
+      if fcntl is not None:
+         if exclusive:
+            fcntl.flock(self.lock_file.fileno(),fcntl.LOCK_EX)
+         else:
+            fcntl.flock(self.lock_file.fileno(),fcntl.LOCK_SH)
+
+      elif msvcrt is not None:
+         self.lock_file.seek(0)
+         msvcrt.locking(self.lock_file.fileno(),msvcrt.LK_LOCK,1)
+
+   #--------------------------------------------------------------------------
+
+   def release(self):
+      if fcntl is not None:
+         fcntl.flock(self.lock_file.fileno(),fcntl.LOCK_UN)
+
+      elif msvcrt is not None:
+         self.lock_file.seek(0)
+         msvcrt.locking(self.lock_file.fileno(),msvcrt.LK_UNLCK,1)
+
+      self.lock_file.close()
+      self.lock_file = None
+
+##############################################################################
+# SCORE STORE
+##############################################################################
+
+class ScoreStore:
+   """
+   Scores are lines of 'board:seed:clicks:frames' appended to the log.  A
+   board is named by its size, e.g. '12x12'.  Fewer clicks is better and
+   ties are broken by fewer frames.
+
+   Scores added are held until flush() so a batch of games finishing
+   together costs one locked append.  The scores read are cached and only
+   lines appended since the last read are read again.  When the log grows
+   by COMPACT_AFTER scores since it was last compacted it is rewritten to a
+   temporary file holding only the scores that could still appear on a
+   leaderboard, which is then renamed over the log.
+   """
+
+   def __init__(self,path=SCORE_LOG_FILE):
+      self.path = path
+      self.lock = FileLock(path+".lock")
+
+      #scores added but not yet written
+      self.pending = []
+
+      #(board, seed, clicks, frames) for every score read from the log.
+      #The seed is a string, or None if the game wasn't seeded.
+      self.scores = []
+
+      #file id and size of the log when it was last read
+      self._file_id = None
+      self._offset = 0
+
+      #number of scores left by the last compaction
+      self._compacted = 0
+
+   #--------------------------------------------------------------------------
+
+   def add(self,board,clicks,frames,seed=None):
+      """
+      Queues a score to be written by the next flush().
+      """
+      self.pending.append((board,seed,int(clicks),int(frames)))
+
+   #--------------------------------------------------------------------------
+
+   def flush(self):
+      """
+      Appends the queued scores to the log, compacting it if it has grown
+      too large.
+      """
+
+      if not self.pending:
+         return
+
+      lines = []
+
+      for board, seed, clicks, frames in self.pending:
+         if seed is None:
+            seed = NO_SEED
+         lines.append(SCORE_DELIMITER.join((board,str(seed),str(clicks),
+                                            str(frames)))+"\n")
+
+      self.lock.acquire()
+
+      try:
+         log_file = open(self.path,"a")
+         log_file.write("".join(lines))
+         log_file.close()
+
+         self.pending = []
+
+         self._load()
+
+         if len(self.scores) > self._compacted+COMPACT_AFTER:
+            self._compact()
+
+      finally:
+         self.lock.release()
+
+   #--------------------------------------------------------------------------
+
+   def refresh(self):
+      """
+      Reads any scores written to the log since it was last read.
+      """
+
+      self.lock.acquire(False)
+
+      try:
+         self._load()
+      finally:
+         self.lock.release()
+
+   #--------------------------------------------------------------------------
+
+   def top(self,board,n=10,seed=None):
+      """
+      Returns the best 'n' scores for 'board', or for the game on 'board'
+      started from 'seed' if it is given, as a list of (clicks, frames,
+      seed) from best to worst.
+      """
+
+      self.refresh()
+
+      if seed is None:
+         scores = [(clicks,frames,score_seed)
+                   for score_board, score_seed, clicks, frames in self.scores
+                   if score_board == board]
+      else:
+         seed = str(seed)
+         scores = [(clicks,frames,score_seed)
+                   for score_board, score_seed, clicks, frames in self.scores
+                   if score_board == board and score_seed == seed]
+
+      scores.sort(key=_rank)
+
+      return scores[:n]
+
+   #--------------------------------------------------------------------------
+
+   def best(self,board,seed=None):
+      """
+      Returns the best (clicks, frames) for 'board', or None if no games
+      have been recorded.
+      """
+
+      scores = self.top(board,1,seed)
+
+      if not scores:
+         return None
+
+      return scores[0][:2]
+
+   #--------------------------------------------------------------------------
+
+   def _load(self):
+      """
+      Brings the cached scores up to date with the log.  Must be called with
+      the lock held.
+      """
+
+      try:
+         stat = os.stat(self.path)
+      except OSError:
+         self.scores = []
+         self._file_id = None
+         self._offset = 0
+         return
+
+      file_id = (stat.st_dev,stat.st_ino)
+
+      #the log has been replaced by compaction so read it all again
+      if file_id != self._file_id or stat.st_size < self._offset:
+         self.scores = []
+         self._file_id = file_id
+         self._offset = 0
+
+      if stat.st_size == self._offset:
+         return
+
+      log_file = open(self.path,"rb")
+      log_file.seek(self._offset)
+      data = log_file.read()
+      log_file.close()
+
+      #only whole lines are read, a partly written line is left for later
+      end = data.rfind(b"\n")+1
+      self._offset += end
+
+      for line in data[:end].decode("ascii").splitlines():
+         try:
+            board, seed, clicks, frames = line.split(SCORE_DELIMITER)
+            if seed == NO_SEED:
+               seed = None
+            self.scores.append((board,seed,int(clicks),int(frames)))
+         except ValueError:
+            pass
+
+   #--------------------------------------------------------------------------
+
+   def _compact(self):
+      """
+      Rewrites the log with only the best KEEP_PER_BOARD scores for each
+      board, the best KEEP_PER_SEED for each of the last KEEP_SEEDS seeds
+      played and the best score for every other seed.  Must be called with
+      the lock held.
+      """
+
+      #scores are gathered by their position in the log, as the same score
+      #can be recorded more than once
+      by_board = {}
+      by_seed = {}
+
+      for i, (board, seed, clicks, frames) in enumerate(self.scores):
+         by_board.setdefault(board,[]).append(i)
+
+         if seed is not None:
+            by_seed.setdefault((board,seed),[]).append(i)
+
+      rank = lambda i: _score_rank(self.scores[i])
+      kept = set()
+
+      for positions in by_board.values():
+         positions.sort(key=rank)
+         kept.update(positions[:KEEP_PER_BOARD])
+
+      #seeds ordered by when they were last played, most recent first
+      seeds = sorted(by_seed.values(),key=lambda positions: positions[-1],
+                     reverse=True)
+
+      for seed_count, positions in enumerate(seeds):
+         positions.sort(key=rank)
+
+         if seed_count < KEEP_SEEDS:
+            kept.update(positions[:KEEP_PER_SEED])
+         else:
+            kept.add(positions[0])
+
+      #keep the scores in the order they were recorded
+      scores = [self.scores[i] for i in sorted(kept)]
+
+      self._compacted = len(scores)
+
+      #nothing would be dropped so leave the log as it is
+      if len(scores) == len(self.scores):
+         return
+
+      self.scores = scores
+
+      temp_path = self.path+".tmp"
+      temp_file = open(temp_path,"w")
+
+      for board, seed, clicks, frames in self.scores:
+         if seed is None:
+            seed = NO_SEED
+         temp_file.write(SCORE_DELIMITER.join((board,seed,str(clicks),
+                                               str(frames)))+"\n")
+
+      temp_file.flush()
+      os.fsync(temp_file.fileno())
+      temp_file.close()
+
+      replace_file(temp_path,self.path)
+
+      stat = os.stat(self.path)
+      self._file_id = (stat.st_dev,stat.st_ino)
+      self._offset = stat.st_size
+
+#-----------------------------------------------------------------------------
+
+def _rank(score):
+   """
+   Sort key for a (clicks, frames, seed) score.
+   """
+   return score[:2]
+
+def _score_rank(score):
+   """
+   Sort key for a (board, seed, clicks, frames) score.
+   """
+   return score[2:]
+
+#-----------------------------------------------------------------------------
+
+def board_name(width,height):
+   """
+   Returns the name scores are recorded under for a board of 'width' by
+   'height' squares.
+   """
+   return "%dx%d" % (width,height)
+
+##############################################################################
+# SHARED STORES
+##############################################################################
+
+#path -> ScoreStore, so every game in a process shares one cache
+_stores = {}
+
+def get_score_store(path=SCORE_LOG_FILE):
+   """
+   Returns the ScoreStore for 'path', creating it the first time.
+   """
+
+   if path not in _stores:
+      _stores[path] = ScoreStore(path)
+
+   return _stores[path]
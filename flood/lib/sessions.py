@@ -0,0 +1,195 @@
+##############################################################################
+# sessions.py
+##############################################################################
+# Hosts many independent headless games in one process, e.g. for a server
+# playing games on behalf of remote players.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import random
+import sys
+
+from . import gamestate
+from .simulation import HeadlessGame
+from .gamestate import BOARD_WIDTH, BOARD_HEIGHT, NUM_COLORS
+from .replay import ReplayRecorder
+
+##############################################################################
+# SESSION MANAGER
+##############################################################################
+
+class SessionManager:
+   """
+   Keeps a HeadlessGame for each session.  Every game has its own game
+   event manager and its own random number generator seeded from the
+   session's seed, so sessions never affect each other.
+
+   Clicks can be applied straight away with click() or queued with
+   submit() and applied to every session that has any in one pass by
+   step().
+
+   If a ReplayWriter is given every session's clicks are recorded and
+   written to it when the session is closed.
+   """
+
+   def __init__(self,array_grid=None,seed=None,replay_writer=None):
+      """
+      array_grid    - use ArrayGrids for the games instead of Grids.
+                      Defaults to the ARRAY_GRID setting in gamestate when
+                      each session is created.
+      seed          - seed for picking the seeds of sessions created
+                      without one.
+      replay_writer - ReplayWriter the sessions' replays are written to.
+      """
+
+      self.array_grid = array_grid
+      self.replay_writer = replay_writer
+
+      #session id -> ReplayRecorder
+      self.recorders = {}
+
+      #session id -> game
+      self.sessions = {}
+
+      #session id -> list of squares clicked since the last step
+      self.pending = {}
+
+      self._rng = random.Random(seed)
+      self._next_id = 0
+
+   #--------------------------------------------------------------------------
+
+   def create_session(self,seed=None,width=BOARD_WIDTH,height=BOARD_HEIGHT,
+                      num_colors=NUM_COLORS):
+      """
+      Starts a new game on a board of the given size and returns its
+      session id.
+      """
+
+      if seed is None:
+         seed = self._rng.getrandbits(32)
+
+      array_grid = self.array_grid
+
+      if array_grid is None:
+         array_grid = gamestate.ARRAY_GRID
+
+      session_id = self._next_id
+      self._next_id += 1
+
+      game = HeadlessGame(seed,array_grid,width,height,num_colors)
+      self.sessions[session_id] = game
+
+      if self.replay_writer is not None:
+         self.recorders[session_id] = ReplayRecorder(seed,width,height,
+                                                     game.grid.colors,
+                                                     array_grid)
+
+      return session_id
+
+   #--------------------------------------------------------------------------
+
+   def close_session(self,session_id):
+      """
+      Throws away a session's game and any clicks waiting for it.  The
+      game's replay is written if replays are being recorded.
+      """
+
+      del self.sessions[session_id]
+      self.pending.pop(session_id,None)
+
+      recorder = self.recorders.pop(session_id,None)
+
+      if recorder is not None:
+         self.replay_writer.write(recorder.replay)
+
+   #--------------------------------------------------------------------------
+
+   def get_game(self,session_id):
+      return self.sessions[session_id]
+
+   #--------------------------------------------------------------------------
+
+   def click(self,session_id,square_idx):
+      """
+      Applies a click to a session's game straight away.  Returns True if
+      it changed the grid.  'square_idx' can be replay.UNDO or replay.REDO
+      to undo or redo a move instead.
+      """
+
+      if session_id in self.recorders:
+         self.recorders[session_id].record(square_idx)
+
+      return self.sessions[session_id].play_move(square_idx)
+
+   #--------------------------------------------------------------------------
+
+   def submit(self,session_id,square_idx):
+      """
+      Queues a click for a session to be applied by the next step().
+      """
+
+      if session_id not in self.sessions:
+         raise KeyError(session_id)
+
+      if session_id in self.pending:
+         self.pending[session_id].append(square_idx)
+      else:
+         self.pending[session_id] = [square_idx]
+
+   #--------------------------------------------------------------------------
+
+   def step(self):
+      """
+      Applies every queued click.  Returns a dictionary of session id to
+      (click_count, won) for each session that had clicks queued.
+      """
+
+      pending = self.pending
+      self.pending = {}
+
+      results = {}
+
+      for session_id, clicks in pending.items():
+         game = self.sessions[session_id]
+         recorder = self.recorders.get(session_id)
+
+         for square_idx in clicks:
+            if game.is_won():
+               break
+
+            if recorder is not None:
+               recorder.record(square_idx)
+
+            game.play_move(square_idx)
+
+         results[session_id] = (game.click_count, game.is_won())
+
+      return results
+
+   #--------------------------------------------------------------------------
+
+   def memory_usage(self,session_id):
+      """
+      Returns roughly how many bytes a session's game takes up.
+      """
+
+      game = self.sessions[session_id]
+
+      return sys.getsizeof(game)+sys.getsizeof(game.rng)+\
+             game.grid.memory_usage()
+
+   #--------------------------------------------------------------------------
+
+   def total_memory_usage(self):
+      """
+      Returns roughly how many bytes all the sessions take up.
+      """
+
+      total = 0
+
+      for session_id in self.sessions:
+         total += self.memory_usage(session_id)
+
+      return total
@@ -0,0 +1,181 @@
+##############################################################################
+# simulation.py
+##############################################################################
+# Runs games of Flood without a display, clock or player.  Used to play
+# large numbers of seeded games as fast as possible, e.g. to measure how
+# hard boards are or how well a strategy does.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import random
+
+from .gamestate import GameEventManager, GameEventListener, SquareClicked, \
+                       GridUpdated, GridUndone, UNDO_MOVE, REDO_MOVE, \
+                       create_grid, BOARD_WIDTH, BOARD_HEIGHT, NUM_COLORS, \
+                       PALETTE
+from .replay import UNDO, REDO
+from .workers import pool_imap
+
+##############################################################################
+# PLAYERS
+##############################################################################
+# A player is any function that takes a HeadlessGame and returns the index
+# of the square to click next.  Players used with run_games must be defined
+# at module level so they can be sent to the worker processes.
+
+def random_player(game):
+   """
+   Clicks a random square around the edge of the top-left block.
+   """
+   return game.rng.choice(game.grid._get_edge_squares())
+
+##############################################################################
+# HEADLESS GAME
+##############################################################################
+
+class HeadlessGame(GameEventListener):
+   """
+   The rules of GameState with nothing attached to pygame.  Clicks are
+   applied straight away by click() instead of coming from the mouse.
+   """
+
+   event_types = (GridUpdated,GridUndone)
+
+   def __init__(self,seed=None,array_grid=None,width=BOARD_WIDTH,
+                height=BOARD_HEIGHT,num_colors=NUM_COLORS):
+      """
+      seed       - seed for the grid colours and random players.  Games with
+                   the same seed start with the same grid.
+      array_grid - use an ArrayGrid instead of a Grid.  Defaults to the
+                   ARRAY_GRID setting in gamestate.
+      width      - number of squares in each row of the board
+      height     - number of rows
+      num_colors - number of colours from PALETTE the squares can be
+      """
+
+      self.game_event_manager = GameEventManager()
+      GameEventListener.__init__(self,self.game_event_manager)
+
+      self.seed = seed
+      self.rng = random.Random(seed)
+
+      self.grid = create_grid(self.game_event_manager,1,self.rng,array_grid,
+                              width=width,height=height,
+                              colors=PALETTE[:num_colors])
+
+      self.click_count = 0
+
+   #--------------------------------------------------------------------------
+
+   def notify(self,event):
+      if isinstance(event,GridUpdated):
+         self.click_count += 1
+      if isinstance(event,GridUndone):
+         self.click_count -= 1
+
+   #--------------------------------------------------------------------------
+
+   def click(self,square_idx):
+      """
+      Clicks on a square.  Returns True if the click changed the grid.
+      """
+
+      click_count = self.click_count
+      self.game_event_manager.post(SquareClicked(square_idx))
+      return self.click_count != click_count
+
+   #--------------------------------------------------------------------------
+
+   def undo(self):
+      """
+      Takes back the last move.  Returns True if there was one.
+      """
+
+      click_count = self.click_count
+      self.game_event_manager.post(UNDO_MOVE)
+      return self.click_count != click_count
+
+   #--------------------------------------------------------------------------
+
+   def redo(self):
+      """
+      Plays the last move taken back again.  Returns True if there was one.
+      """
+
+      click_count = self.click_count
+      self.game_event_manager.post(REDO_MOVE)
+      return self.click_count != click_count
+
+   #--------------------------------------------------------------------------
+
+   def play_move(self,square_idx):
+      """
+      Clicks on a square, or undoes or redoes a move if 'square_idx' is
+      replay.UNDO or replay.REDO, the way moves are recorded in replays.
+      """
+
+      if square_idx == UNDO:
+         return self.undo()
+
+      if square_idx == REDO:
+         return self.redo()
+
+      return self.click(square_idx)
+
+   #--------------------------------------------------------------------------
+
+   def is_won(self):
+      return self.grid.is_filled()
+
+   #--------------------------------------------------------------------------
+
+   def play(self,player,max_clicks=None):
+      """
+      Lets 'player' click until the game is won, or until 'max_clicks'
+      clicks have changed the grid.  Returns the number of clicks taken.
+      """
+
+      while not self.is_won():
+
+         if max_clicks is not None and self.click_count >= max_clicks:
+            break
+
+         self.click(player(self))
+
+      return self.click_count
+
+##############################################################################
+# BATCH RUNNER
+##############################################################################
+
+def play_game(args):
+   """
+   Plays one headless game.  'args' is a (seed, player, array_grid, width,
+   height, num_colors) tuple and the result is a (seed, click_count) tuple.
+   """
+
+   seed, player, array_grid, width, height, num_colors = args
+
+   game = HeadlessGame(seed,array_grid,width,height,num_colors)
+
+   return (seed, game.play(player))
+
+#-----------------------------------------------------------------------------
+
+def run_games(seeds,player=random_player,array_grid=None,processes=None,
+              chunksize=64,width=BOARD_WIDTH,height=BOARD_HEIGHT,
+              num_colors=NUM_COLORS):
+   """
+   Plays a game for each seed in 'seeds' spread over a pool of worker
+   processes, one per core unless 'processes' is given.  Every game is on
+   a board of 'width' by 'height' squares of 'num_colors' colours.  Yields
+   a (seed, click_count) tuple as each game finishes, so results arrive in
+   whatever order the workers complete them.
+   """
+
+   tasks = ((seed, player, array_grid, width, height, num_colors)
+            for seed in seeds)
+
+   for result in pool_imap(play_game,tasks,processes,chunksize,False):
+      yield result
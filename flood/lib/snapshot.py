@@ -0,0 +1,154 @@
+##############################################################################
+# snapshot.py
+##############################################################################
+# Boards as flat buffers of colour indices, and a way of handing them to
+# worker processes through shared memory rather than pickling them for every
+# task.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+##############################################################################
+# BOARD SNAPSHOT
+##############################################################################
+
+class BoardSnapshot:
+   """
+   The colour index of every square of a board, row by row, one byte per
+   square.  'cells' is anything supporting the buffer protocol, e.g. a
+   memoryview of a grid's own colour indices, so taking a snapshot copies
+   nothing.
+
+   A snapshot taken from a grid is a view of it and changes as the grid
+   does.  Use copy() to keep the board as it is.  Pickling a snapshot
+   copies its cells.
+   """
+
+   def __init__(self,cells,width,height,num_colors):
+      self.cells = cells
+      self.width = width
+      self.height = height
+      self.num_colors = num_colors
+
+   #--------------------------------------------------------------------------
+
+   def __len__(self):
+      return self.width*self.height
+
+   #--------------------------------------------------------------------------
+
+   def __reduce__(self):
+      return (BoardSnapshot,(self.tobytes(),self.width,self.height,
+                             self.num_colors))
+
+   #--------------------------------------------------------------------------
+
+   def tobytes(self):
+      return bytes(self.cells)
+
+   #--------------------------------------------------------------------------
+
+   def copy(self):
+      """
+      Returns a snapshot with its own copy of the cells.
+      """
+      return BoardSnapshot(bytearray(self.cells),self.width,self.height,
+                           self.num_colors)
+
+   #--------------------------------------------------------------------------
+
+   def to_board(self):
+      """
+      Returns a solver.Board of the snapshot.
+      """
+
+      from .solver import Board
+
+      return Board(list(bytearray(self.cells)),self.width,self.num_colors)
+
+##############################################################################
+# SHARED MEMORY
+##############################################################################
+
+class SharedBoard:
+   """
+   A copy of a snapshot in a block of shared memory.  Tasks are handed
+   'handle', a small tuple naming the block, and workers call attach_board
+   with it to read the board where it is.
+
+   The creating process owns the block and must call close() when the
+   workers have finished with it.  Requires python 3.8 or later.
+   """
+
+   def __init__(self,snapshot):
+
+      from multiprocessing import shared_memory
+
+      size = len(snapshot)
+
+      #a block can't be empty
+      self.memory = shared_memory.SharedMemory(create=True,size=max(1,size))
+      self.memory.buf[:size] = snapshot.cells
+
+      self.handle = (self.memory.name,snapshot.width,snapshot.height,
+                     snapshot.num_colors)
+
+      self.snapshot = BoardSnapshot(self.memory.buf[:size],snapshot.width,
+                                    snapshot.height,snapshot.num_colors)
+
+   #--------------------------------------------------------------------------
+
+   def close(self):
+      """
+      Frees the block.  Workers still attached keep their mapping until
+      they detach.
+      """
+
+      if self.memory is None:
+         return
+
+      #views of the buffer have to go before it can be closed
+      self.snapshot.cells.release()
+      self.snapshot = None
+
+      self.memory.close()
+      self.memory.unlink()
+      self.memory = None
+
+#-----------------------------------------------------------------------------
+
+#block name -> SharedMemory, so a worker attaches to each board once however
+#many tasks it runs on it
+_attached = {}
+
+def attach_board(handle):
+   """
+   Returns a BoardSnapshot reading the shared board named by 'handle'
+   straight from shared memory.
+   """
+
+   from multiprocessing import shared_memory
+
+   name, width, height, num_colors = handle
+
+   if name not in _attached:
+      _attached[name] = shared_memory.SharedMemory(name)
+
+   return BoardSnapshot(_attached[name].buf[:width*height],width,height,
+                        num_colors)
+
+#-----------------------------------------------------------------------------
+
+def detach_boards():
+   """
+   Closes every shared board this process has attached to.  Snapshots
+   returned by attach_board must no longer be in use.
+   """
+
+   for memory in _attached.values():
+      try:
+         memory.close()
+      except BufferError:
+         pass
+
+   _attached.clear()
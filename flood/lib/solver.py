@@ -0,0 +1,629 @@
+##############################################################################
+# solver.py
+##############################################################################
+# Finds sequences of moves that solve a grid.  The grid is reduced to a graph
+# of same-coloured blocks and positions are stored as bitmasks over those
+# blocks, so searching doesn't have to copy or re-flood the squares.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import heapq
+
+from .boards import neighbour_table
+from .bitboard import bitboard_from_grid
+from .snapshot import SharedBoard, attach_board
+from .workers import pool_imap
+
+##############################################################################
+# BOARD
+##############################################################################
+
+class Board:
+   """
+   A grid reduced to its blocks of connected squares of the same colour.
+
+   A position in a game is described by two bitmasks over the blocks:
+   'region' is the blocks joined to the top-left and 'frontier' is the
+   blocks touching the region.  A move is a colour index.
+   """
+
+   def __init__(self,cells,width,num_colors):
+      """
+      cells      - list of colour indices, one per square, row by row
+      width      - number of squares in each row
+      num_colors - number of colours in the palette
+      """
+
+      self.cells = cells
+      self.width = width
+      self.num_colors = num_colors
+
+      self._find_blocks()
+
+   #--------------------------------------------------------------------------
+
+   def _find_blocks(self):
+      """
+      Labels every square with the block it belongs to and works out which
+      blocks touch.
+      """
+
+      cells = self.cells
+      size = len(cells)
+      neighbours = neighbour_table(self.width,size//self.width)
+
+      block_of = [-1]*size
+
+      #colour, number of squares and first square of each block
+      self.block_colors = []
+      self.block_sizes = []
+      self.block_squares = []
+
+      for start in range(size):
+
+         if block_of[start] != -1:
+            continue
+
+         block = len(self.block_colors)
+         color = cells[start]
+         block_of[start] = block
+         stack = [start]
+         count = 0
+
+         while stack:
+            idx = stack.pop()
+            count += 1
+
+            for n in neighbours[idx*4:idx*4+4]:
+               if n != -1 and block_of[n] == -1 and cells[n] == color:
+                  block_of[n] = block
+                  stack.append(n)
+
+         self.block_colors.append(color)
+         self.block_sizes.append(count)
+         self.block_squares.append(start)
+
+      #bitmask of the blocks next to each block
+      self.adjacent = [0]*len(self.block_colors)
+
+      for idx in range(size):
+         for n in neighbours[idx*4:idx*4+4]:
+            if n != -1 and block_of[n] != block_of[idx]:
+               self.adjacent[block_of[idx]] |= 1 << block_of[n]
+
+      #bitmask of the blocks of each colour
+      self.color_masks = [0]*self.num_colors
+
+      for block, color in enumerate(self.block_colors):
+         self.color_masks[color] |= 1 << block
+
+      self.block_of = block_of
+      self.solved = (1 << len(self.block_colors))-1
+
+   #--------------------------------------------------------------------------
+
+   def start(self):
+      """
+      Returns the (region, frontier) position before any moves are made.
+      """
+      block = self.block_of[0]
+      return (1 << block, self.adjacent[block])
+
+   #--------------------------------------------------------------------------
+
+   def moves(self,frontier):
+      """
+      Returns the colours that would grow the region.
+      """
+      return [color for color in range(self.num_colors)
+              if frontier & self.color_masks[color]]
+
+   #--------------------------------------------------------------------------
+
+   def play(self,region,frontier,color):
+      """
+      Returns the (region, frontier, absorbed) after changing the region to
+      'color', where 'absorbed' is a bitmask of the blocks it joined.
+      """
+
+      absorbed = frontier & self.color_masks[color]
+      region |= absorbed
+
+      new = absorbed
+      adjacent = self.adjacent
+
+      while new:
+         low = new & -new
+         frontier |= adjacent[low.bit_length()-1]
+         new ^= low
+
+      return (region, frontier & ~region, absorbed)
+
+   #--------------------------------------------------------------------------
+
+   def count_squares(self,blocks):
+      """
+      Returns the number of squares in the bitmask of 'blocks'.
+      """
+
+      count = 0
+      sizes = self.block_sizes
+
+      while blocks:
+         low = blocks & -blocks
+         count += sizes[low.bit_length()-1]
+         blocks ^= low
+
+      return count
+
+   #--------------------------------------------------------------------------
+
+   def lower_bound(self,region,frontier):
+      """
+      Returns a number of moves that solving from this position can't beat.
+      A move removes at most one colour from the blocks outside the region
+      and reaches at most one block further out, so the larger of the
+      colours left and the distance to the furthest block is admissible.
+      """
+
+      colors_left = 0
+      for mask in self.color_masks:
+         if mask & ~region:
+            colors_left += 1
+
+      distance = 0
+      seen = region
+      layer = frontier
+      adjacent = self.adjacent
+
+      while layer:
+         distance += 1
+         seen |= layer
+
+         next_layer = 0
+         while layer:
+            low = layer & -layer
+            next_layer |= adjacent[low.bit_length()-1]
+            layer ^= low
+
+         layer = next_layer & ~seen
+
+      return max(colors_left,distance)
+
+#-----------------------------------------------------------------------------
+
+def board_from_grid(grid):
+   """
+   Creates a Board from the current squares of a Grid or ArrayGrid.
+   """
+
+   return grid.snapshot().to_board()
+
+##############################################################################
+# TRANSPOSITION TABLE
+##############################################################################
+
+class TranspositionTable:
+   """
+   Remembers the fewest moves a region has been reached in so that the
+   searches don't expand the same position twice.  Keyed on the region
+   bitmask, which fully describes a position.
+   """
+
+   def __init__(self,max_entries=4000000):
+      self.max_entries = max_entries
+      self.entries = {}
+      self.hits = 0
+
+   #--------------------------------------------------------------------------
+
+   def visit(self,region,depth):
+      """
+      Records reaching 'region' after 'depth' moves.  Returns False if it
+      has already been reached in as few moves, meaning it can be skipped.
+      """
+
+      best = self.entries.get(region)
+
+      if best is not None and best <= depth:
+         self.hits += 1
+         return False
+
+      if best is None and len(self.entries) >= self.max_entries:
+         self.entries.clear()
+
+      self.entries[region] = depth
+      return True
+
+##############################################################################
+# STRATEGIES
+##############################################################################
+# Each strategy has a solve(board) method returning a list of colour
+# indices that solve the board, or None if it gave up.
+
+class GreedyStrategy:
+   """
+   Always picks the colour that joins the most squares to the region.
+   """
+
+   def solve(self,board):
+
+      region, frontier = board.start()
+      moves = []
+
+      while region != board.solved:
+
+         best = None
+
+         for color in board.moves(frontier):
+            result = board.play(region,frontier,color)
+            absorbed = board.count_squares(result[2])
+
+            if best is None or absorbed > best[0]:
+               best = (absorbed, color, result)
+
+         moves.append(best[1])
+         region, frontier = best[2][0], best[2][1]
+
+      return moves
+
+#-----------------------------------------------------------------------------
+
+class BeamStrategy:
+   """
+   Keeps the 'width' best positions at each move, where a position is rated
+   by the most squares it can reach in 'lookahead' more moves.
+   """
+
+   def __init__(self,width=16,lookahead=2):
+      self.width = width
+      self.lookahead = lookahead
+
+   #--------------------------------------------------------------------------
+
+   def solve(self,board):
+
+      region, frontier = board.start()
+
+      if region == board.solved:
+         return []
+
+      table = TranspositionTable()
+      beam = [(region, frontier, [])]
+      depth = 0
+
+      while True:
+
+         depth += 1
+         children = []
+
+         #positions already reached in as few moves, only searched if
+         #there is nothing else to go on
+         revisits = []
+
+         for region, frontier, moves in beam:
+            for color in board.moves(frontier):
+               new_region, new_frontier, absorbed = \
+                                          board.play(region,frontier,color)
+
+               if new_region == board.solved:
+                  return moves+[color]
+
+               if not table.visit(new_region,depth):
+                  revisits.append((new_region, new_frontier, moves+[color]))
+                  continue
+
+               score = self._score(board,new_region,new_frontier,
+                                   self.lookahead-1)
+               children.append((score, new_region, new_frontier,
+                                moves+[color]))
+
+         #every move grows the region, so this only runs out on a board
+         #that can't be solved
+         if not children:
+            children = [(self._score(board,new_region,new_frontier,
+                                     self.lookahead-1),
+                         new_region, new_frontier, moves)
+                        for new_region, new_frontier, moves in revisits]
+
+         if not children:
+            return None
+
+         children.sort(key=lambda child: child[0],reverse=True)
+
+         beam = [(child[1], child[2], child[3])
+                 for child in children[:self.width]]
+
+   #--------------------------------------------------------------------------
+
+   def _score(self,board,region,frontier,lookahead):
+      """
+      Returns the most squares the region can cover in 'lookahead' moves.
+      """
+
+      if lookahead <= 0 or region == board.solved:
+         return board.count_squares(region)
+
+      best = 0
+
+      for color in board.moves(frontier):
+         new_region, new_frontier, absorbed = \
+                                          board.play(region,frontier,color)
+         best = max(best,self._score(board,new_region,new_frontier,
+                                     lookahead-1))
+
+      return best
+
+#-----------------------------------------------------------------------------
+
+class AStarStrategy:
+   """
+   Finds a shortest solution with A* search using Board.lower_bound.  Gives
+   up and returns None after expanding 'max_nodes' positions.
+   """
+
+   def __init__(self,max_nodes=1000000):
+      self.max_nodes = max_nodes
+
+   #--------------------------------------------------------------------------
+
+   def solve(self,board):
+
+      region, frontier = board.start()
+
+      if region == board.solved:
+         return []
+
+      table = TranspositionTable()
+      table.visit(region,0)
+
+      #region -> (previous region, colour) for rebuilding the moves
+      came_from = {region: None}
+
+      #ties on f are broken towards deeper positions, then insertion order
+      count = 0
+      queue = [(board.lower_bound(region,frontier), 0, count, region,
+                frontier)]
+
+      while queue and count < self.max_nodes:
+
+         f, neg_depth, order, region, frontier = heapq.heappop(queue)
+         depth = -neg_depth
+
+         if table.entries.get(region,depth) < depth:
+            continue
+
+         for color in board.moves(frontier):
+            new_region, new_frontier, absorbed = \
+                                          board.play(region,frontier,color)
+
+            if not table.visit(new_region,depth+1):
+               continue
+
+            came_from[new_region] = (region, color)
+
+            if new_region == board.solved:
+               return _rebuild_moves(came_from,new_region)
+
+            count += 1
+            heapq.heappush(queue,(depth+1+board.lower_bound(new_region,
+                                                            new_frontier),
+                                  -(depth+1), count, new_region,
+                                  new_frontier))
+
+      return None
+
+#-----------------------------------------------------------------------------
+
+class IDAStarStrategy:
+   """
+   Finds a shortest solution with iterative deepening A*, which uses far
+   less memory than AStarStrategy.  Gives up and returns None after
+   expanding 'max_nodes' positions.
+   """
+
+   def __init__(self,max_nodes=5000000):
+      self.max_nodes = max_nodes
+
+   #--------------------------------------------------------------------------
+
+   def solve(self,board):
+
+      region, frontier = board.start()
+      bound = board.lower_bound(region,frontier)
+
+      self._nodes = 0
+
+      while self._nodes < self.max_nodes:
+
+         self._table = TranspositionTable()
+         moves = []
+
+         result = self._search(board,region,frontier,moves,bound)
+
+         if result is True:
+            return moves
+
+         if result is None:
+            return None
+
+         bound = result
+
+      return None
+
+   #--------------------------------------------------------------------------
+
+   def _search(self,board,region,frontier,moves,bound):
+      """
+      Depth first search to 'bound' moves.  Returns True when solved with
+      the solution in 'moves', None when the node limit is hit, otherwise
+      the smallest bound that went over.
+      """
+
+      if region == board.solved:
+         return True
+
+      depth = len(moves)
+      f = depth+board.lower_bound(region,frontier)
+
+      if f > bound:
+         return f
+
+      self._nodes += 1
+      if self._nodes >= self.max_nodes:
+         return None
+
+      smallest = None
+
+      for color in board.moves(frontier):
+         new_region, new_frontier, absorbed = \
+                                          board.play(region,frontier,color)
+
+         if not self._table.visit(new_region,depth+1):
+            continue
+
+         moves.append(color)
+         result = self._search(board,new_region,new_frontier,moves,bound)
+
+         if result is True or result is None:
+            return result
+
+         moves.pop()
+
+         if smallest is None or result < smallest:
+            smallest = result
+
+      if smallest is None:
+         return bound+1
+
+      return smallest
+
+#-----------------------------------------------------------------------------
+
+def _rebuild_moves(came_from,region):
+   """
+   Follows the came_from links of A* back to the start.
+   """
+
+   moves = []
+
+   while came_from[region] is not None:
+      region, color = came_from[region]
+      moves.append(color)
+
+   moves.reverse()
+   return moves
+
+##############################################################################
+# STRATEGY LOOKUP
+##############################################################################
+
+STRATEGIES = {
+   "greedy": GreedyStrategy,
+   "beam": BeamStrategy,
+   "astar": AStarStrategy,
+   "idastar": IDAStarStrategy,
+}
+
+#-----------------------------------------------------------------------------
+
+def solve(board,strategy="greedy"):
+   """
+   Solves 'board' with a strategy object or the name of one in STRATEGIES.
+   """
+
+   if not hasattr(strategy,'solve'):
+      strategy = STRATEGIES[strategy]()
+
+   return strategy.solve(board)
+
+#-----------------------------------------------------------------------------
+
+def par_score(board,strategy=None):
+   """
+   Returns the number of moves to solve 'board'.  By default tries an exact
+   search and falls back to a beam search if it gives up.
+   """
+
+   if strategy is not None:
+      moves = solve(board,strategy)
+      if moves is None:
+         return None
+      return len(moves)
+
+   moves = AStarStrategy(200000).solve(board)
+
+   if moves is None:
+      moves = BeamStrategy().solve(board)
+
+   return len(moves)
+
+#-----------------------------------------------------------------------------
+
+def _solve_shared(args):
+   """
+   Solves a board in shared memory.  'args' is a (handle, strategy) tuple,
+   see snapshot.SharedBoard, and the result is a (strategy, moves) tuple.
+   """
+
+   handle, strategy = args
+
+   return (strategy, solve(attach_board(handle).to_board(),strategy))
+
+#-----------------------------------------------------------------------------
+
+def solve_each(snapshot,strategies,processes=None):
+   """
+   Solves the board in 'snapshot' with each of the named 'strategies' at
+   once, spread over a pool of worker processes.  The board is put in
+   shared memory once and only its handle is sent with each task.  Returns
+   a dict of strategy name -> moves.
+   """
+
+   shared_board = SharedBoard(snapshot)
+
+   try:
+      tasks = [(shared_board.handle, strategy) for strategy in strategies]
+      results = dict(pool_imap(_solve_shared,tasks,processes,ordered=False))
+
+   finally:
+      shared_board.close()
+
+   return results
+
+##############################################################################
+# PLAYERS
+##############################################################################
+
+def edge_square_for_color(grid,color_idx):
+   """
+   Returns a square around the edge of the top-left block of the given
+   colour, or None if there isn't one.
+   """
+
+   if hasattr(grid,'cells'):
+      flat_cells = grid.cells.ravel()
+      for idx in grid._get_edge_squares():
+         if flat_cells[idx] == color_idx:
+            return idx
+      return None
+
+   for idx in grid._frontier.get(grid.colors[color_idx],()):
+      return idx
+
+   return None
+
+#-----------------------------------------------------------------------------
+
+def greedy_player(game):
+   """
+   Player for simulation.HeadlessGame that makes the greedy move.  Moves
+   are scored on a bit board, which is much quicker to build each turn than
+   a Board.
+   """
+
+   scores = bitboard_from_grid(game.grid).score_moves()
+   best = scores.index(max(scores))
+
+   return edge_square_for_color(game.grid,best)
@@ -0,0 +1,38 @@
+##############################################################################
+# workers.py
+##############################################################################
+# Runs batches of tasks over a pool of worker processes.
+##############################################################################
+# 10/26 GoshDarnGames
+##############################################################################
+
+import multiprocessing
+
+def pool_imap(func,tasks,processes=None,chunksize=1,ordered=True):
+   """
+   Calls 'func' on each of 'tasks' in a pool of worker processes, one per
+   core unless 'processes' is given, and yields the results.  'func' must
+   be defined at module level and take a single argument, so tasks with
+   several values are passed as tuples.  If 'ordered' is False results are
+   yielded as the workers finish them rather than in the order of 'tasks'.
+
+   The workers are stopped once every result has been yielded, or as soon
+   as the caller stops asking for them.
+   """
+
+   pool = multiprocessing.Pool(processes)
+
+   try:
+      if ordered:
+         results = pool.imap(func,tasks,chunksize)
+      else:
+         results = pool.imap_unordered(func,tasks,chunksize)
+
+      for result in results:
+         yield result
+
+      pool.close()
+
+   finally:
+      pool.terminate()
+      pool.join()